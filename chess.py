@@ -1,16 +1,33 @@
 # -*- coding: utf-8 -*-
 
+import array
 import collections
 import random
 import re
+import struct
 import types
 import datetime
 import itertools
 import os
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
 
+PACKED_SIZE = 32
+
+
+class MoveError(Exception):
+    """Raised when a move is not legal in a position."""
+
+
+class FenError(Exception):
+    """Raised when a FEN or EPD is invalid."""
+
 
 def opposite_color(color):
     """:return: The opposite color.
@@ -43,38 +60,42 @@ class Piece(object):
     True
     """
 
-    __cache = dict()
+    __slots__ = ("__symbol", "__color", "__full_color", "__type",
+                 "__full_type", "__hash")
 
-    def __init__(self, symbol):
-        self.__symbol = symbol
-
-        self.__color = "w" if symbol != symbol.lower() else "b"
-        self.__full_color = "white" if self.__color == "w" else "black"
-
-        self.__type = symbol.lower()
-        if self.__type == "p":
-            self.__full_type = "pawn"
-        elif self.__type == "n":
-            self.__full_type = "knight"
-        elif self.__type == "b":
-            self.__full_type = "bishop"
-        elif self.__type == "r":
-            self.__full_type = "rook"
-        elif self.__type == "q":
-            self.__full_type = "queen"
-        elif self.__type == "k":
-            self.__full_type = "king"
-        else:
-            raise ValueError("Expected valid piece symbol, got: %s." % symbol)
+    __cache = dict()
 
-        self.__hash = ord(self.__symbol)
+    __full_types = {
+        "p": "pawn",
+        "n": "knight",
+        "b": "bishop",
+        "r": "rook",
+        "q": "queen",
+        "k": "king",
+    }
 
     def __new__(cls, symbol):
+        # Pieces are immutable flyweights. They are only initialized
+        # the first time they are requested.
         try:
             return cls.__cache[symbol]
         except KeyError:
-            cls.__cache[symbol] = super(Piece, cls).__new__(cls, symbol)
-            return cls.__cache[symbol]
+            pass
+
+        type = symbol.lower()
+        if not type in cls.__full_types:
+            raise ValueError("Expected valid piece symbol, got: %s." % symbol)
+
+        piece = super(Piece, cls).__new__(cls)
+        piece.__symbol = symbol
+        piece.__color = "w" if symbol != type else "b"
+        piece.__full_color = "white" if piece.__color == "w" else "black"
+        piece.__type = type
+        piece.__full_type = cls.__full_types[type]
+        piece.__hash = ord(symbol)
+
+        cls.__cache[symbol] = piece
+        return piece
 
     @classmethod
     def from_color_and_type(cls, color, type):
@@ -150,8 +171,13 @@ class Piece(object):
     def __repr__(self):
         return "Piece('%s')" % self.__symbol
 
+    def __reduce__(self):
+        # Unpickle through the constructor to get the flyweight.
+        return (Piece, (self.__symbol, ))
+
     def __eq__(self, other):
-        return isinstance(other, Piece) and self.__symbol == other.symbol
+        return self is other or (
+            isinstance(other, Piece) and self.__hash == other.__hash)
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -172,31 +198,37 @@ class Square(object):
     True
     """
 
+    __slots__ = ("__name", "__file", "__x", "__rank", "__y", "__x88",
+                 "__index")
+
     __cache = dict()
 
-    def __init__(self, name):
+    def __new__(cls, name):
+        # Squares are immutable flyweights. They are only initialized
+        # the first time they are requested.
+        try:
+            return cls.__cache[name]
+        except KeyError:
+            pass
+
         if not len(name) == 2:
             raise ValueError("Expected square name, got: %s." % repr(name))
-        self.__name = name
-
         if not name[0] in ["a", "b", "c", "d", "e", "f", "g", "h"]:
             raise ValueError("Expected file, got: %s." % repr(name[0]))
-        self.__file = name[0]
-        self.__x = ord(self.__name[0]) - ord("a")
-
         if not name[1] in ["1", "2", "3", "4", "5", "6", "7", "8"]:
             raise ValueError("Expected rank, got: %s." % repr(name[1]))
-        self.__rank = int(name[1])
-        self.__y = ord(self.__name[1]) - ord("1")
 
-        self.__x88 = self.__x + 16 * (7 - self.__y)
+        square = super(Square, cls).__new__(cls)
+        square.__name = name
+        square.__file = name[0]
+        square.__x = ord(name[0]) - ord("a")
+        square.__rank = int(name[1])
+        square.__y = ord(name[1]) - ord("1")
+        square.__x88 = square.__x + 16 * (7 - square.__y)
+        square.__index = square.__x + 8 * square.__y
 
-    def __new__(cls, name):
-        try:
-            return cls.__cache[name]
-        except KeyError:
-            cls.__cache[name] = super(Square, cls).__new__(cls, name)
-            return cls.__cache[name]
+        cls.__cache[name] = square
+        return square
 
     @classmethod
     def from_x88(cls, x88):
@@ -212,7 +244,7 @@ class Square(object):
         if x88 & 0x88:
             raise ValueError("x88 is not on the board: %s." % repr(x88))
 
-        return cls("abcdefgh"[x88 & 7] + "87654321"[x88 >> 4])
+        return SQUARES_X88[x88]
 
     @classmethod
     def from_rank_and_file(cls, rank, file):
@@ -229,7 +261,7 @@ class Square(object):
         if not file in ["a", "b", "c", "d", "e", "f", "g", "h"]:
             raise ValueError("Expected the file to be a letter between 'a' and 'h': %s." % repr(file))
 
-        return cls(file + str(rank))
+        return SQUARES[ord(file) - ord("a") + 8 * (rank - 1)]
 
     @classmethod
     def from_x_and_y(cls, x, y):
@@ -240,7 +272,24 @@ class Square(object):
         :param y:
             An integer between 0 and 7 where 0 is the first rank.
         """
-        return cls("abcdefgh"[x] + "12345678"[y])
+        if x < 0 or x > 7 or y < 0 or y > 7:
+            raise IndexError(
+                "Expected coordinates between 0 and 7: %s." % repr((x, y)))
+
+        return SQUARES[x + 8 * y]
+
+    @classmethod
+    def from_index(cls, index):
+        """Creates a square object from a bitboard index.
+
+        :param index:
+            An integer between 0 and 63 where 0 is a1, 1 is b1 and 63
+            is h8.
+        """
+        if index < 0 or index > 63:
+            raise ValueError("Index is out of range: %s." % repr(index))
+
+        return SQUARES[index]
 
     @property
     def name(self):
@@ -273,9 +322,15 @@ class Square(object):
         index of the square."""
         return self.__x88
 
+    @property
+    def index(self):
+        """The bitboard index of the square, starting with 0 for a1,
+        1 for b1 and ending with 63 for h8."""
+        return self.__index
+
     def is_dark(self):
         """:return: Whether it is a dark square."""
-        return (self.__x - self.__y % 2) == 0
+        return (self.__x + self.__y) % 2 == 0
 
     def is_light(self):
         """:return: Whether it is a light square."""
@@ -291,8 +346,13 @@ class Square(object):
     def __repr__(self):
         return "Square('%s')" % self.__name
 
+    def __reduce__(self):
+        # Unpickle through the constructor to get the flyweight.
+        return (Square, (self.__name, ))
+
     def __eq__(self, other):
-        return isinstance(other, Square) and self.__name == other.name
+        return self is other or (
+            isinstance(other, Square) and self.__index == other.__index)
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -301,6 +361,179 @@ class Square(object):
         return self.__x88
 
 
+# Lookup tables of all squares by `Square.index` and by x88 index.
+SQUARES = [Square("abcdefgh"[index & 7] + "12345678"[index >> 3])
+           for index in range(64)]
+
+SQUARES_X88 = [None] * 128
+for _square in SQUARES:
+    SQUARES_X88[_square.x88] = _square
+del _square
+
+
+# Bitboards are 64 bit integers with one bit per square. Bit 0 is a1, bit 1
+# is b1 and bit 63 is h8, the same order as `Square.index`.
+BB_VOID = 0
+BB_ALL = 0xffffffffffffffff
+
+BB_SQUARES = [1 << index for index in range(64)]
+
+BB_FILES = [0x0101010101010101 << x for x in range(8)]
+BB_RANKS = [0xff << (8 * y) for y in range(8)]
+
+BB_LIGHT_SQUARES = 0x55aa55aa55aa55aa
+BB_DARK_SQUARES = 0xaa55aa55aa55aa55
+
+
+def popcount(bb):
+    """:return: The number of squares in a bitboard."""
+    return bin(bb).count("1")
+
+
+def scan_forward(bb):
+    """:yield: The indexes of all squares in a bitboard, starting with
+    the lowest index."""
+    while bb:
+        b = bb & -bb
+        yield b.bit_length() - 1
+        bb ^= b
+
+
+def _step_attack_table(deltas):
+    table = []
+    for index in range(64):
+        x, y = index & 7, index >> 3
+        bb = BB_VOID
+        for dx, dy in deltas:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                bb |= BB_SQUARES[x + dx + 8 * (y + dy)]
+        table.append(bb)
+    return table
+
+
+def _ray(index, dx, dy, occupied=BB_VOID):
+    # Walks from the square in the given direction until the edge of the
+    # board or the first occupied square (inclusive).
+    bb = BB_VOID
+    x, y = (index & 7) + dx, (index >> 3) + dy
+    while 0 <= x < 8 and 0 <= y < 8:
+        bb |= BB_SQUARES[x + 8 * y]
+        if occupied & BB_SQUARES[x + 8 * y]:
+            break
+        x, y = x + dx, y + dy
+    return bb
+
+
+def _line_attack_tables(directions):
+    # For every square: a mask of the relevant blockers (excluding the
+    # edges, which never block anything behind them) and a dictionary
+    # from masked occupancy to the attacked squares.
+    masks = []
+    tables = []
+    for index in range(64):
+        mask = BB_VOID
+        for dx, dy in directions:
+            x, y = (index & 7) + dx, (index >> 3) + dy
+            while 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                mask |= BB_SQUARES[x + 8 * y]
+                x, y = x + dx, y + dy
+        masks.append(mask)
+
+        table = dict()
+        subset = BB_VOID
+        while True:
+            attacks = BB_VOID
+            for dx, dy in directions:
+                attacks |= _ray(index, dx, dy, subset)
+            table[subset] = attacks
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+        tables.append(table)
+    return masks, tables
+
+
+def _between_and_line_tables():
+    between = [[BB_VOID] * 64 for index in range(64)]
+    line = [[BB_VOID] * 64 for index in range(64)]
+    for a in range(64):
+        for dx, dy in [(1, 0), (1, 1), (0, 1), (-1, 1),
+                       (-1, 0), (-1, -1), (0, -1), (1, -1)]:
+            full = _ray(a, dx, dy) | _ray(a, -dx, -dy) | BB_SQUARES[a]
+            bb = BB_VOID
+            x, y = (a & 7) + dx, (a >> 3) + dy
+            while 0 <= x < 8 and 0 <= y < 8:
+                between[a][x + 8 * y] = bb
+                line[a][x + 8 * y] = full
+                bb |= BB_SQUARES[x + 8 * y]
+                x, y = x + dx, y + dy
+    return between, line
+
+
+# BB_BETWEEN[a][b] are the squares strictly between two squares on a common
+# rank, file or diagonal. BB_LINE[a][b] is the whole line through them.
+BB_BETWEEN, BB_LINE = _between_and_line_tables()
+
+BB_KNIGHT_ATTACKS = _step_attack_table(
+    [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+BB_KING_ATTACKS = _step_attack_table(
+    [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+BB_PAWN_ATTACKS = {
+    "w": _step_attack_table([(-1, 1), (1, 1)]),
+    "b": _step_attack_table([(-1, -1), (1, -1)]),
+}
+
+BB_RANK_MASKS, BB_RANK_ATTACKS = _line_attack_tables([(1, 0), (-1, 0)])
+BB_FILE_MASKS, BB_FILE_ATTACKS = _line_attack_tables([(0, 1), (0, -1)])
+BB_DIAG_MASKS, BB_DIAG_ATTACKS = _line_attack_tables([(1, 1), (-1, -1)])
+BB_ANTI_DIAG_MASKS, BB_ANTI_DIAG_ATTACKS = _line_attack_tables([(1, -1), (-1, 1)])
+
+
+def bishop_attacks(index, occupied):
+    """:return: A bitboard of the squares attacked by a bishop on the
+    square with the given index."""
+    return (BB_DIAG_ATTACKS[index][occupied & BB_DIAG_MASKS[index]] |
+            BB_ANTI_DIAG_ATTACKS[index][occupied & BB_ANTI_DIAG_MASKS[index]])
+
+
+def rook_attacks(index, occupied):
+    """:return: A bitboard of the squares attacked by a rook on the
+    square with the given index."""
+    return (BB_RANK_ATTACKS[index][occupied & BB_RANK_MASKS[index]] |
+            BB_FILE_ATTACKS[index][occupied & BB_FILE_MASKS[index]])
+
+
+# The squares a rook or a bishop attacks on an empty board.
+BB_ROOK_RAYS = [rook_attacks(index, BB_VOID) for index in range(64)]
+BB_BISHOP_RAYS = [bishop_attacks(index, BB_VOID) for index in range(64)]
+
+
+def piece_attacks(piece, index, occupied):
+    """:return: A bitboard of the squares attacked by a piece standing
+    on the square with the given index.
+
+    :param piece:
+        The attacking piece.
+    :param index:
+        The bitboard index of the square the piece is standing on.
+    :param occupied:
+        A bitboard of all occupied squares, that block sliding pieces.
+    """
+    type = piece.type
+    if type == "p":
+        return BB_PAWN_ATTACKS[piece.color][index]
+    elif type == "n":
+        return BB_KNIGHT_ATTACKS[index]
+    elif type == "b":
+        return bishop_attacks(index, occupied)
+    elif type == "r":
+        return rook_attacks(index, occupied)
+    elif type == "q":
+        return bishop_attacks(index, occupied) | rook_attacks(index, occupied)
+    else:
+        return BB_KING_ATTACKS[index]
+
+
 class Move(object):
     """Represents a move.
 
@@ -318,10 +551,22 @@ class Move(object):
     >>> e4 = chess.Move(chess.Square("e2"), chess.Square("e4"))
     >>> e4 == chess.Move.from_uci("e2e4")
     True
+
+    Moves can also be encoded as 16 bit integers. Bits 0 to 5 are the
+    index of the source square, bits 6 to 11 the index of the target
+    square and bits 12 to 14 the promotion: 0 for none, then 1 to 4
+    for knight, bishop, rook and queen.
+
+    >>> chess.Move.from_uci("e2e4").to_int()
+    1804
     """
 
     __uci_move_regex = re.compile(r"^([a-h][1-8])([a-h][1-8])([rnbq]?)$")
 
+    __promotion_codes = {None: 0, "n": 1, "b": 2, "r": 3, "q": 4}
+
+    __promotion_types = (None, "n", "b", "r", "q")
+
     def __init__(self, source, target, promotion=None):
         if not isinstance(source, Square):
             raise TypeError("Expected source to be a Square.")
@@ -351,6 +596,27 @@ class Move(object):
             else:
                 raise ValueError("Expected promotion type, got: %s." % repr(promotion))
 
+        self.__int = (source.index | target.index << 6 |
+                      self.__promotion_codes[self.__promotion] << 12)
+
+    @classmethod
+    def from_int(cls, move):
+        """Creates a move from its 16 bit integer encoding.
+
+        :param move:
+            An integer as returned by `Move.to_int()`.
+        """
+        promotion = move >> 12
+        if move < 0 or promotion > 4:
+            raise ValueError("Invalid move encoding: %s." % repr(move))
+
+        return cls(SQUARES[move & 63], SQUARES[move >> 6 & 63],
+                   cls.__promotion_types[promotion])
+
+    def to_int(self):
+        """:return: The move encoded as a 16 bit integer."""
+        return self.__int
+
     @classmethod
     def from_uci(cls, uci):
         """The UCI move string like `"a1a2"` or `"b7b8q"`."""
@@ -414,13 +680,13 @@ class Move(object):
         return "Move.from_uci(%s)" % repr(self.uci)
 
     def __eq__(self, other):
-        return isinstance(other, Move) and self.uci == other.uci
+        return isinstance(other, Move) and self.__int == other.to_int()
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash(self.uci)
+        return self.__int
 
 
 MoveInfo = collections.namedtuple("MoveInfo", [
@@ -436,6 +702,15 @@ MoveInfo = collections.namedtuple("MoveInfo", [
     "is_checkmate"])
 
 
+Status = collections.namedtuple("Status", [
+    "is_check",
+    "is_checkmate",
+    "is_stalemate",
+    "is_insufficient_material",
+    "is_fifty_moves",
+    "is_game_over"])
+
+
 class Position(object):
     """Represents a chess position.
 
@@ -463,83 +738,409 @@ class Position(object):
 
     __san_regex = re.compile('^([NBKRQ])?([a-h])?([1-8])?x?([a-h][1-8])(=[NBRQ])?(\+|#)?$')
 
+    __castling_regex = re.compile(r"^(KQ?k?q?|Qk?q?|kq?|q|-)$")
+
+    __ep_regex = re.compile(r"^(-|[a-h][36])$")
+
+    __half_moves_regex = re.compile(r"^(0|[1-9][0-9]*)$")
+
+    __ply_regex = re.compile(r"^[1-9][0-9]*$")
+
+    __epd_operation_regex = re.compile(r'\s*([A-Za-z][A-Za-z0-9_]*)((?:\s+(?:"[^"]*"|[^\s;"]+))*)\s*(?:;|$)')
+
+    __epd_operand_regex = re.compile(r'"([^"]*)"|([^\s;"]+)')
+
+    __legal_move_cache = None
+
+    # The king and rook that must be on their squares for each castling
+    # right, with their bitboard masks.
+    # TODO: Support Chess960.
+    __castling_pieces = {
+        "K": ("K", BB_SQUARES[4], "R", BB_SQUARES[7]),
+        "Q": ("K", BB_SQUARES[4], "R", BB_SQUARES[0]),
+        "k": ("k", BB_SQUARES[60], "r", BB_SQUARES[63]),
+        "q": ("k", BB_SQUARES[60], "r", BB_SQUARES[56])}
+
     def __init__(self, fen=START_FEN):
-        self.__castling = "KQkq"
         self.fen = fen
 
-    def copy(self):
+    def __init_state(self, board, turn, castling, ep_file, half_moves, ply):
+        # Sets all state of the position at once, without validation.
+        # Every way of creating or replacing a position goes through
+        # here, so that new state only needs to be set up in one place.
+        # The board is a list indexed by `Square.index` and is not
+        # copied.
+        self.__shared = False
+        self.__stack = []
+        self.__turn = turn
+        self.__castling = castling
+        self.__set_board(board)
+        self.__ep_file = ep_file
+        self.__half_moves = half_moves
+        self.__ply = ply
+
+    @classmethod
+    def from_epd(cls, epd):
+        """Creates a position from an EPD. See `Position.set_epd()`.
+
+        :return:
+            A tuple of the new position and a dictionary of the EPD
+            operations.
+        """
+        position = cls.__new__(cls)
+        operations = position.set_epd(epd)
+        return position, operations
+
+    def pack(self):
+        """Encodes the position in `PACKED_SIZE` bytes.
+
+        The encoding is a 64 bit occupancy bitboard, a 4 bit code for
+        each of up to 32 pieces in the order of `Square.index`, then
+        flags for the turn and the castling rights, the en-passant
+        file, the half-move counter and the ply. Numbers are little
+        endian.
+
+        :return:
+            A string of `PACKED_SIZE` bytes.
+
+        :raise ValueError:
+            If there are more than 32 pieces on the board or the move
+            counters are too large.
+        """
+        buffer = bytearray(PACKED_SIZE)
+        self.pack_into(buffer)
+        return str(buffer)
+
+    def pack_into(self, buffer, offset=0):
+        """Encodes the position into a writable buffer like a
+        `bytearray`. See `Position.pack()`.
+
+        :param buffer:
+            The buffer to write to.
+        :param offset:
+            Defaults to `0`. Where to start writing.
+        """
+        occupied = self.__occupied
+        if popcount(occupied) > 32:
+            raise ValueError("Can not pack more than 32 pieces.")
+        if self.__half_moves > 0xffff or self.__ply > 0xffffffff:
+            raise ValueError("Move counters too large to pack.")
+
+        pieces = 0
+        shift = 0
+        board = self.__board
+        for index in scan_forward(occupied):
+            pieces |= _PACKED_PIECE_CODES[board[index].symbol] << shift
+            shift += 4
+
+        flags = 1 if self.__turn == "b" else 0
+        for bit, type in enumerate("KQkq"):
+            if type in self.__castling:
+                flags |= 2 << bit
+
+        ep_square = self.__get_ep_square()
+        ep_file = 0 if ep_square == "-" else ord(ep_square[0]) - ord("a") + 1
+
+        struct.pack_into(_PACKED_FORMAT, buffer, offset,
+                         occupied, pieces & BB_ALL, pieces >> 64,
+                         flags, ep_file, self.__half_moves, self.__ply)
+
+    @classmethod
+    def unpack(cls, data, offset=0):
+        """Decodes a position encoded with `Position.pack()`.
+
+        :param data:
+            A string, `bytearray`, `memoryview` or other buffer.
+        :param offset:
+            Defaults to `0`. Where to start reading.
+
+        :return:
+            A new position.
+
+        :raise ValueError:
+            If the data is not a valid encoding.
+        """
+        try:
+            (occupied, low, high, flags, ep_file,
+             half_moves, ply) = struct.unpack_from(_PACKED_FORMAT, data, offset)
+        except struct.error:
+            raise ValueError("Expected %d bytes to unpack." % PACKED_SIZE)
+
+        if popcount(occupied) > 32 or flags > 31 or ep_file > 8 or ply < 1:
+            raise ValueError("Invalid packed position.")
+
+        board = [None] * 64
+        pieces = low | high << 64
+        for index in scan_forward(occupied):
+            code = pieces & 15
+            if code >= 12:
+                raise ValueError("Invalid piece code in packed position.")
+            board[index] = _PACKED_PIECES[code]
+            pieces >>= 4
+
+        position = cls.__new__(cls)
+        position.__init_state(
+            board,
+            "b" if flags & 1 else "w",
+            "".join(type for bit, type in enumerate("KQkq") if flags & (2 << bit)),
+            "abcdefgh"[ep_file - 1] if ep_file else None,
+            half_moves,
+            ply)
+        return position
+
+    def copy(self, copy_on_write=False):
         """Gets a copy of the position. The copy will not change when the
         original instance is changed.
 
+        :param copy_on_write:
+            Defaults to `False`. If `True` the copy and the original
+            share the board and the move stack until one of them is
+            changed. This makes copies that are mostly read cheaper.
+
         :return:
             An exact copy of the positon.
         """
-        return Position(self.fen)
+        position = type(self).__new__(type(self))
+        position.__board = self.__board
+        position.__bitboards = self.__bitboards
+        position.__occupied_co = self.__occupied_co
+        position.__occupied = self.__occupied
+        position.__stack = self.__stack
+        position.__turn = self.__turn
+        position.__castling = self.__castling
+        position.__ep_file = self.__ep_file
+        position.__half_moves = self.__half_moves
+        position.__ply = self.__ply
+        position.__zobrist = self.__zobrist
+        position.__cache = self.__cache.copy()
+        position.__legal_move_cache = self.__legal_move_cache
+
+        if copy_on_write:
+            self.__shared = True
+            position.__shared = True
+        else:
+            position.__unshare()
+
+        return position
+
+    def freeze(self):
+        """Gets an immutable snapshot of the position.
+
+        :return:
+            A `FrozenPosition` that is equal to the position.
+        """
+        zobrist = self.__zobrist
+        ep_file = self.__ep_file
+        if ep_file:
+            if self.get_theoretical_ep_right(ep_file):
+                zobrist ^= _ZOBRIST_EP_KEYS[ep_file]
+            else:
+                ep_file = None
+        return FrozenPosition(tuple(self.__board), self.__turn,
+                              self.__castling, ep_file, self.__half_moves,
+                              self.__ply, zobrist)
+
+    @classmethod
+    def from_frozen(cls, frozen):
+        """Creates a position from a `FrozenPosition`. See
+        `FrozenPosition.thaw()`.
+
+        :return:
+            A new position without a move stack.
+        """
+        position = cls.__new__(cls)
+        position.__init_state(list(frozen.board), frozen.turn,
+                              frozen.castling, frozen.ep_file,
+                              frozen.half_moves, frozen.ply)
+        return position
+
+    def __unshare(self):
+        # Take private copies of storage that might be shared with
+        # copy-on-write copies.
+        self.__board = list(self.__board)
+        self.__bitboards = self.__bitboards.copy()
+        self.__occupied_co = self.__occupied_co.copy()
+        self.__stack = list(self.__stack)
+        self.__shared = False
 
     def __get_square_index(self, square_or_int):
         if type(square_or_int) is types.IntType:
             # Validate the index by passing it through the constructor.
-            return Square.from_x88(square_or_int).x88
+            return Square.from_x88(square_or_int).index
         elif isinstance(square_or_int, basestring):
-            return Square(square_or_int).x88
+            return Square(square_or_int).index
         elif type(square_or_int) is Square:
-            return square_or_int.x88
+            return square_or_int.index
         else:
             raise TypeError(
                 "Expected integer or Square, got: %s." % repr(square_or_int))
 
+    def __set_piece_at(self, index, piece):
+        self.__remove_piece_at(index)
+        if piece:
+            mask = BB_SQUARES[index]
+            self.__board[index] = piece
+            self.__bitboards[piece.symbol] |= mask
+            self.__occupied_co[piece.color] |= mask
+            self.__occupied |= mask
+            self.__zobrist ^= _ZOBRIST_PIECE_KEYS[piece.symbol][index]
+
+    def __remove_piece_at(self, index):
+        piece = self.__board[index]
+        if piece:
+            mask = BB_SQUARES[index]
+            self.__board[index] = None
+            self.__bitboards[piece.symbol] ^= mask
+            self.__occupied_co[piece.color] ^= mask
+            self.__occupied ^= mask
+            self.__zobrist ^= _ZOBRIST_PIECE_KEYS[piece.symbol][index]
+        return piece
+
     def __getitem__(self, key):
         return self.__board[self.__get_square_index(key)]
 
     def __setitem__(self, key, value):
         if value is None or type(value) is Piece:
-            self.__board[self.__get_square_index(key)] = value
+            if self.__shared:
+                self.__unshare()
+            if self.__cache:
+                self.__cache = {}
+            self.__set_piece_at(self.__get_square_index(key), value)
         else:
             raise TypeError("Expected Piece or None, got: %s." % repr(value))
 
     def __delitem__(self, key):
-        self.__board[self.__get_square_index(key)] = None
+        if self.__shared:
+            self.__unshare()
+        if self.__cache:
+            self.__cache = {}
+        self.__remove_piece_at(self.__get_square_index(key))
 
     def clear_board(self):
         """Removes all pieces from the board."""
-        self.__board = [None] * 128
+        if self.__shared:
+            self.__unshare()
+
+        # The board is stored twice: As a list of pieces indexed by
+        # `Square.index` and as one bitboard per piece and color.
+        self.__board = [None] * 64
+        self.__bitboards = dict((symbol, BB_VOID) for symbol in "PNBRQKpnbrqk")
+        self.__occupied_co = {"w": BB_VOID, "b": BB_VOID}
+        self.__occupied = BB_VOID
+
+        # Facts derived from the position, like attack maps, are
+        # computed lazily and cached until the position changes.
+        self.__cache = {}
+
+        # The Zobrist key is kept up to date with every change of the
+        # pieces, the castling rights and the turn. Only the
+        # en-passant part is added when the position is hashed.
+        self.__zobrist = _ZOBRIST_CASTLING_KEYS[self.__castling]
+        if self.__turn == "w":
+            self.__zobrist ^= _ZOBRIST_TURN_KEY
+
+    def __set_board(self, board):
+        # Replaces all pieces at once with those of a list indexed by
+        # `Square.index`. The list is not copied.
+        self.clear_board()
+        bitboards = self.__bitboards
+        occupied_co = self.__occupied_co
+        zobrist = self.__zobrist
+        for index, piece in enumerate(board):
+            if piece:
+                mask = BB_SQUARES[index]
+                symbol = piece.symbol
+                bitboards[symbol] |= mask
+                occupied_co[piece.color] |= mask
+                zobrist ^= _ZOBRIST_PIECE_KEYS[symbol][index]
+        self.__board = board
+        self.__occupied = occupied_co["w"] | occupied_co["b"]
+        self.__zobrist = zobrist
+
+    def get_bitboard(self, piece=None, color=None):
+        """Gets the squares occupied by pieces as a bitboard.
+
+        :param piece:
+            Optional. Only include squares occupied by this piece.
+        :param color:
+            Optional. Only include squares occupied by pieces of this
+            color, `"w"` or `"b"`.
+
+        :return:
+            A 64 bit integer with bit `Square.index` set for every
+            matching square.
+        """
+        if piece is not None:
+            bb = self.__bitboards[piece.symbol]
+            if color is not None and color != piece.color:
+                return BB_VOID
+            return bb
+        elif color is not None:
+            return self.__occupied_co[color]
+        else:
+            return self.__occupied
+
+    def get_squares(self, piece=None, color=None):
+        """Gets the squares occupied by pieces.
+
+        The bitboards double as piece lists, so this only visits
+        occupied squares.
+
+        :param piece:
+            Optional. Only include squares occupied by this piece.
+        :param color:
+            Optional. Only include squares occupied by pieces of this
+            color, `"w"` or `"b"`.
+
+        :return:
+            A list of squares in the order of `Square.index`.
+        """
+        return [SQUARES[index] for index in
+                scan_forward(self.get_bitboard(piece, color))]
 
     def reset(self):
         """Resets to the standard chess start position."""
-        self.set_fen(START_FEN)
+        self.fen = START_FEN
+
+    def __get_disambiguator(self, move, rivals):
+        # The rivals are the source squares of the other pieces of the
+        # same kind that can move to the same target square.
+        if not rivals:
+            return ""
 
-    def __get_disambiguator(self, move):
         same_rank = False
         same_file = False
-        piece = self[move.source]
-
-        for m in self.get_legal_moves():
-            ambig_piece = self[m.source]
-            if (piece == ambig_piece and move.source != m.source and
-                move.target == m.target):
-                if move.source.rank == m.source.rank:
-                    same_rank = True
-
-                if move.source.file == m.source.file:
-                    same_file = True
-
-                if same_rank and same_file:
-                    break
+        for source in rivals:
+            if move.source.rank == source.rank:
+                same_rank = True
+            if move.source.file == source.file:
+                same_file = True
 
         if same_rank and same_file:
             return move.source.name
         elif same_file:
             return str(move.source.rank)
-        elif same_rank:
-            return move.source.file
         else:
-            return ""
+            return move.source.file
+
+    def __get_rivals(self, legal_moves):
+        # Groups the source squares of the legal moves by moving piece
+        # and target square.
+        rivals = collections.defaultdict(set)
+        for move in legal_moves:
+            rivals[(self.__board[move.source.index], move.target)].add(move.source)
+        return rivals
 
-    def get_move_from_san(self, san):
+    def get_move_from_san(self, san, cache=None):
         """Gets a move from standard algebraic notation.
 
         :param san:
             A move string in standard algebraic notation.
+        :param cache:
+            Optional. A dictionary used to remember moves already
+            parsed, keyed by Zobrist hash and SAN. Sharing one among
+            many games that start alike saves parsing the same moves
+            again and again.
 
         :return:
             A Move object.
@@ -547,50 +1148,70 @@ class Position(object):
         :raise MoveError:
             If not exactly one legal move matches.
         """
-        # Castling moves.
-        if san == "O-O" or san == "O-O-O":
-            # TODO: Support Chess960, check the castling moves are valid.
-            rank = 1 if self.turn == "w" else 8
-            if san == "O-O":
-                return Move(
-                    source=Square.from_rank_and_file(rank, 'e'),
-                    target=Square.from_rank_and_file(rank, 'g'))
-            else:
-                return Move(
-                    source=Square.from_rank_and_file(rank, 'e'),
-                    target=Square.from_rank_and_file(rank, 'c'))
-        # Regular moves.
-        else:
-            matches = Position.__san_regex.match(san)
-            if not matches:
-                raise ValueError("Invalid SAN: %s." % repr(san))
-
-            piece = Piece.from_color_and_type(
-                color=self.turn,
-                type=matches.group(1).lower() if matches.group(1) else 'p')
-            target = Square(matches.group(4))
+        if cache is not None:
+            key = (self.get_zobrist_hash(), san)
+            try:
+                return cache[key]
+            except KeyError:
+                pass
 
-            source = None
-            for m in self.get_legal_moves():
-                if self[m.source] != piece or m.target != target:
-                    continue
+        move = self.__parse_san(san)
 
-                if matches.group(2) and matches.group(2) != m.source.file:
-                    continue
-                if matches.group(3) and matches.group(3) != str(m.source.rank):
-                    continue
+        if cache is not None:
+            cache[key] = move
+        return move
 
-                # Move matches. Assert it is not ambiguous.
-                if source:
-                    raise MoveError(
-                        "Move is ambiguous: %s matches %s and %s."
-                            % san, source, m)
-                source = m.source
+    def __parse_san(self, san):
+        # Only the moves of the named piece to the target square are
+        # generated, so usually there is just one candidate to check.
+        turn = self.__turn
 
-            if not source:
-                raise MoveError("No legal move matches %s." % san)
+        # Castling moves.
+        castling = san.rstrip("+#")
+        if castling == "O-O" or castling == "O-O-O":
+            # TODO: Support Chess960.
+            king = self.__bitboards["K" if turn == "w" else "k"]
+            target = Square.from_rank_and_file(
+                1 if turn == "w" else 8, "g" if castling == "O-O" else "c")
+            for _, source, targets in self.__generate_legal_targets(
+                    king & BB_FILES[4], BB_SQUARES[target.index]):
+                return Move(SQUARES[source], target)
+            raise MoveError("No legal move matches %s." % san)
 
-            return Move(source, target, matches.group(5) or None)
+        # Regular moves.
+        matches = Position.__san_regex.match(san)
+        if not matches:
+            raise ValueError("Invalid SAN: %s." % repr(san))
+
+        piece = Piece.from_color_and_type(
+            color=turn,
+            type=matches.group(1).lower() if matches.group(1) else 'p')
+        target = Square(matches.group(4))
+        promotion = matches.group(5)[1:] if matches.group(5) else None
+
+        from_mask = self.__bitboards[piece.symbol]
+        if matches.group(2):
+            from_mask &= BB_FILES[ord(matches.group(2)) - ord("a")]
+        if matches.group(3):
+            from_mask &= BB_RANKS[int(matches.group(3)) - 1]
+
+        source = None
+        for _, index, targets in self.__generate_legal_targets(
+                from_mask, BB_SQUARES[target.index]):
+            # Move matches. Assert it is not ambiguous.
+            if source:
+                raise MoveError(
+                    "Move is ambiguous: %s matches %s and %s."
+                        % (san, source, SQUARES[index]))
+            source = SQUARES[index]
+
+        if not source:
+            raise MoveError("No legal move matches %s." % san)
+
+        if (piece.type == "p" and target.is_backrank()) != bool(promotion):
+            raise MoveError("No legal move matches %s." % san)
+
+        return Move(source, target, promotion)
 
     def get_move_info(self, move):
         """Gets information about a move.
@@ -626,8 +1247,30 @@ class Position(object):
         :raise MoveError:
             If the move is not legal in the position.
         """
-        resulting_position = self.copy().make_move(move)
+        legal_moves = self.__get_legal_move_tuple()
+        if not move in legal_moves:
+            raise MoveError(
+                "%s is not a legal move in the position %s." % (move, self.fen))
+
+        return self.__get_move_info(
+            move, self.__get_rivals(legal_moves), self.copy())
+
+    def get_all_move_infos(self):
+        """Gets information about all legal moves at once. This is much
+        faster than calling `Position.get_move_info()` for each move.
+
+        :return:
+            A list of named tuples as returned by
+            `Position.get_move_info()`, in the order of
+            `Position.get_legal_moves()`.
+        """
+        legal_moves = self.__get_legal_move_tuple()
+        rivals = self.__get_rivals(legal_moves)
+        scratch = self.copy()
+        return [self.__get_move_info(move, rivals, scratch)
+                for move in legal_moves]
 
+    def __get_move_info(self, move, rivals, scratch):
         capture = self[move.target]
         piece = self[move.source]
 
@@ -638,7 +1281,7 @@ class Position(object):
             if move.target.file != move.source.file and not capture:
                 enpassant = True
                 capture = Piece.from_color_and_type(
-                    color=resulting_position.turn, type='p')
+                    color=opposite_color(self.turn), type='p')
 
         # Castling.
         # TODO: Support Chess960.
@@ -649,9 +1292,12 @@ class Position(object):
         else:
             is_king_side_castle = is_queen_side_castle = False
 
-        # Checks.
-        is_check = resulting_position.is_check()
-        is_checkmate = resulting_position.is_checkmate()
+        # Checks. Try the move on a private copy of the position, so
+        # that this position is only read.
+        scratch.make_move(move, False)
+        is_check = scratch.is_check()
+        is_checkmate = is_check and scratch.is_checkmate()
+        scratch.unmake_move()
 
         # Generate the SAN.
         san = ""
@@ -662,8 +1308,9 @@ class Position(object):
         else:
             if piece.type != 'p':
                 san += piece.type.upper()
-
-            san += self.__get_disambiguator(move)
+                san += self.__get_disambiguator(move, [
+                    source for source in rivals[(piece, move.target)]
+                    if source != move.source])
 
             if capture:
                 if piece.type == 'p':
@@ -711,73 +1358,200 @@ class Position(object):
         :raise MoveError:
             If the validate parameter is `True` and the move is not
             legal in the position.
+
+        The move can be taken back with `Position.unmake_move()`.
         """
-        if validate and not move in self.get_legal_moves():
+        if validate and not self.is_legal(move):
             raise MoveError(
                 "%s is not a legal move in the position %s." % (move, self.fen))
 
-        piece = self[move.source]
-        capture = self[move.target]
+        if self.__shared:
+            self.__unshare()
+        if self.__cache:
+            self.__cache = {}
+
+        source = move.source.index
+        target = move.target.index
 
         # Move the piece.
-        self[move.target] = self[move.source]
-        del self[move.source]
+        piece = self.__remove_piece_at(source)
+        capture = self.__remove_piece_at(target)
+        self.__set_piece_at(target, piece)
+
+        # Remember how to take the move back.
+        self.__stack.append((move, piece, capture, self.__castling,
+                             self.__ep_file, self.__half_moves, self.__ply))
 
         # It is the next players turn.
         self.toggle_turn()
 
         # Pawn moves.
-        self.ep_file = None
+        self.__ep_file = None
         if piece.type == "p":
             # En-passant.
             if move.target.file != move.source.file and not capture:
                 if self.turn == "w":
-                    self[move.target.x88 - 16] = None
+                    self.__remove_piece_at(target + 8)
                 else:
-                    self[move.target.x88 + 16] = None
+                    self.__remove_piece_at(target - 8)
                 capture = True
             # If big pawn move, set the en-passant file.
             if abs(move.target.rank - move.source.rank) == 2:
                 if self.get_theoretical_ep_right(move.target.file):
-                    self.ep_file = move.target.file
+                    self.__ep_file = move.target.file
 
         # Promotion.
         if move.promotion:
-            self[move.target] = Piece.from_color_and_type(
-                color=piece.color, type=move.promotion)
+            self.__set_piece_at(target, Piece.from_color_and_type(
+                color=piece.color, type=move.promotion))
 
         # Potential castling.
         if piece.type == "k":
             steps = move.target.x - move.source.x
             if abs(steps) == 2:
-                # Queen-side castling.
-                if steps == -2:
-                    rook_target = move.target.x88 + 1
-                    rook_source = move.target.x88 - 2
-                # King-side castling.
-                else:
-                    rook_target = move.target.x88 - 1
-                    rook_source = move.target.x88 + 1
-                self[rook_target] = self[rook_source]
-                del self[rook_source]
+                rook_source, rook_target = self.__get_castling_rook_squares(target, steps)
+                self.__set_piece_at(rook_target, self.__remove_piece_at(rook_source))
 
         # Increment the half move counter.
         if piece.type == "p" or capture:
-            self.half_moves = 0
+            self.__half_moves = 0
         else:
-            self.half_moves += 1
+            self.__half_moves += 1
 
         # Increment the move number.
         if self.turn == "w":
-            self.ply += 1
+            self.__ply += 1
+
+        # Update castling rights. A right is lost when the king or the
+        # rook is no longer on its square.
+        castling = self.__castling
+        if castling:
+            bitboards = self.__bitboards
+            rights = ""
+            for type in castling:
+                king, king_mask, rook, rook_mask = Position.__castling_pieces[type]
+                if bitboards[king] & king_mask and bitboards[rook] & rook_mask:
+                    rights += type
+            if rights != castling:
+                self.__set_castling(rights)
+
+        return self
+
+    def unmake_move(self):
+        """Takes back the last move made with `Position.make_move()`.
+
+        Pieces, turn, castling rights, en-passant file and move counters
+        are restored from an undo record, so that taking back a move is
+        about as cheap as making it. This assumes the board has not
+        been edited in between.
+
+        :return:
+            The move that has been taken back.
+
+        :raise IndexError:
+            If there is no move to take back.
+        """
+        if self.__shared:
+            self.__unshare()
+        if self.__cache:
+            self.__cache = {}
+
+        (move, piece, capture, castling, ep_file,
+         half_moves, ply) = self.__stack.pop()
+
+        source = move.source.index
+        target = move.target.index
+
+        # It was the other players turn.
+        self.toggle_turn()
+
+        # Move the piece back and restore captured pieces. This also
+        # undoes promotions.
+        self.__remove_piece_at(target)
+        self.__set_piece_at(source, piece)
+        if capture:
+            self.__set_piece_at(target, capture)
+        elif piece.type == "p" and move.target.file != move.source.file:
+            # En-passant.
+            if self.turn == "w":
+                self.__set_piece_at(target - 8, Piece("p"))
+            else:
+                self.__set_piece_at(target + 8, Piece("P"))
+
+        # Castling.
+        if piece.type == "k":
+            steps = move.target.x - move.source.x
+            if abs(steps) == 2:
+                rook_source, rook_target = self.__get_castling_rook_squares(target, steps)
+                self.__set_piece_at(rook_source, self.__remove_piece_at(rook_target))
+
+        self.__set_castling(castling)
+        self.__ep_file = ep_file
+        self.__half_moves = half_moves
+        self.__ply = ply
 
-        # Update castling rights.
-        for type in ["K", "Q", "k", "q"]:
-            if not self.get_theoretical_castling_right(type):
-                self.set_castling_right(type, False)
+        return move
 
+    def pop(self):
+        """Takes back the last move. Alias for `Position.unmake_move()`.
+
+        :return:
+            The move that has been taken back.
+        """
+        return self.unmake_move()
+
+    def replay(self, moves):
+        """Makes a sequence of moves that are known to be legal, like
+        the moves of a game validated on import. The moves are not
+        validated.
+
+        :param moves:
+            An iterable of moves, UCI strings or integer encoded moves.
+            See `Move.to_int()`.
+
+        :return:
+            The same (changed) position object, for chainability.
+        """
+        for move in moves:
+            self.make_move(Position.__to_move(move), False)
         return self
 
+    def replay_hashes(self, moves):
+        """Like `Position.replay()`, but yields the Zobrist hash after
+        each move. Moves are made as the hashes are consumed.
+
+        :param moves:
+            An iterable of moves, UCI strings or integer encoded moves.
+
+        :yield:
+            The hash of each position after the move. See
+            `Position.get_zobrist_hash()`.
+        """
+        for move in moves:
+            self.make_move(Position.__to_move(move), False)
+            yield self.get_zobrist_hash()
+
+    @staticmethod
+    def __to_move(move):
+        if type(move) is Move:
+            return move
+        elif isinstance(move, basestring):
+            return Move.from_uci(move)
+        elif isinstance(move, (int, long)):
+            return Move.from_int(move)
+        else:
+            raise TypeError(
+                "Expected Move, UCI string or integer, got: %s." % repr(move))
+
+    def __get_castling_rook_squares(self, king_target, steps):
+        # TODO: Support Chess960.
+        if steps == -2:
+            # Queen-side castling.
+            return king_target - 2, king_target + 1
+        else:
+            # King-side castling.
+            return king_target + 1, king_target - 1
+
     @property
     def turn(self):
         """Whos turn it is as `"w"` or `"b"`."""
@@ -788,6 +1562,10 @@ class Position(object):
         if not value in ["w", "b"]:
             raise ValueError(
                 "Expected 'w' or 'b' for turn, got: %s." % repr(value))
+        if value != self.__turn:
+            self.__zobrist ^= _ZOBRIST_TURN_KEY
+            if self.__cache:
+                self.__cache = {}
         self.__turn = value
 
     def toggle_turn(self):
@@ -825,25 +1603,14 @@ class Position(object):
             A boolean indicating whether the player could theoretically
             have that castling right.
         """
-        if not type in ["K", "Q", "k", "q"]:
+        try:
+            king, king_mask, rook, rook_mask = Position.__castling_pieces[type]
+        except KeyError:
             raise KeyError(
                 "Expected 'K', 'Q', 'k' or 'q' as a castling type, got: %s."
                     % repr(type))
-        # TODO: Support Chess960.
-        if type == "K" or type == "Q":
-            if self["e1"] != Piece("K"):
-                return False
-            if type == "K":
-                return self["h1"] == Piece("R")
-            elif type == "Q":
-                return self["a1"] == Piece("R")
-        elif type == "k" or type == "q":
-            if self["e8"] != Piece("k"):
-                return False
-            if type == "k":
-                return self["h8"] == Piece("r")
-            elif type == "q":
-                return self["a8"] == Piece("r")
+        return bool(self.__bitboards[king] & king_mask and
+                    self.__bitboards[rook] & rook_mask)
 
     def get_theoretical_ep_right(self, file):
         """Checks if a player could have an ep-move in theory from
@@ -861,34 +1628,24 @@ class Position(object):
                 "Expected a letter between 'a' and 'h' for the file, got: %s."
                     % repr(file))
 
-        # Check there is a pawn.
-        pawn_square = Square.from_rank_and_file(
-            rank=4 if self.turn == "b" else 5, file=file)
-        opposite_color_pawn = Piece.from_color_and_type(
-            color=opposite_color(self.turn), type="p")
-        if self[pawn_square] != opposite_color_pawn:
-            return False
-
-        # Check the square below is empty.
-        square_below = Square.from_rank_and_file(
-            rank=3 if self.turn == "b" else 6, file=file)
-        if self[square_below]:
-            return False
-
-        # Check there is a pawn of the other color on a neighbor file.
+        # Check there is a pawn that just made a big move, the square it
+        # skipped is empty and there is a pawn of the other color on a
+        # neighbor file.
         f = ord(file) - ord("a")
-        p = Piece("p")
-        P = Piece("P")
-        if self.turn == "b":
-            if f > 0 and self[Square.from_x_and_y(f - 1, 3)] == p:
-                return True
-            elif f < 7 and self[Square.from_x_and_y(f + 1, 3)] == p:
-                return True
+        if self.__turn == "b":
+            pawn, below, capturers = f + 24, f + 16, self.__bitboards["p"]
+            if not self.__bitboards["P"] & BB_SQUARES[pawn]:
+                return False
         else:
-            if f > 0 and self[Square.from_x_and_y(f - 1, 4)] == P:
-                return True
-            elif f < 7 and self[Square.from_x_and_y(f + 1, 4)] == P:
-                return True
+            pawn, below, capturers = f + 32, f + 40, self.__bitboards["P"]
+            if not self.__bitboards["p"] & BB_SQUARES[pawn]:
+                return False
+        if self.__occupied & BB_SQUARES[below]:
+            return False
+        if f > 0 and capturers & BB_SQUARES[pawn - 1]:
+            return True
+        if f < 7 and capturers & BB_SQUARES[pawn + 1]:
+            return True
         return False
 
     def set_castling_right(self, type, status):
@@ -913,6 +1670,13 @@ class Position(object):
                     castling += t
             elif self.get_castling_right(t):
                 castling += t
+        self.__set_castling(castling)
+
+    def __set_castling(self, castling):
+        if self.__cache:
+            self.__cache = {}
+        self.__zobrist ^= _ZOBRIST_CASTLING_KEYS[self.__castling]
+        self.__zobrist ^= _ZOBRIST_CASTLING_KEYS[castling]
         self.__castling = castling
 
     @property
@@ -928,6 +1692,8 @@ class Position(object):
                 "Expected None or a letter between 'a' and 'h' for the "
                 "en-passant file, got: %s." % repr(value))
 
+        if self.__cache:
+            self.__cache = {}
         self.__ep_file = value
 
     @property
@@ -943,6 +1709,8 @@ class Position(object):
         if value < 0:
             raise ValueError("Half move count must be >= 0.")
 
+        if self.__cache:
+            self.__cache = {}
         self.__half_moves = value
 
     @property
@@ -959,6 +1727,9 @@ class Position(object):
                 "Expected integer for ply count, got: %s." % repr(value))
         if value < 1:
             raise ValueError("Ply count must be >= 1.")
+
+        if self.__cache:
+            self.__cache = {}
         self.__ply = value
 
     def get_piece_counts(self, color = "wb"):
@@ -985,9 +1756,11 @@ class Position(object):
             "k": 0,
             "q": 0,
         }
-        for piece in self.__board:
-            if piece and piece.color in color:
-                counts[piece.type] += 1
+        for type in counts:
+            if "w" in color:
+                counts[type] += popcount(self.__bitboards[type.upper()])
+            if "b" in color:
+                counts[type] += popcount(self.__bitboards[type])
         return counts
 
     def get_king(self, color):
@@ -1004,49 +1777,32 @@ class Position(object):
         if not color in ["w", "b"]:
             raise KeyError("Invalid color: %s." % repr(color))
 
-        for x88, piece in enumerate(self.__board):
-            if piece and piece.color == color and piece.type == "k":
-                return Square.from_x88(x88)
+        # The king bitboard tracks the king square.
+        kings = self.__bitboards["K" if color == "w" else "k"]
+        if not kings:
+            return None
+        elif not kings & (kings - 1):
+            return SQUARES[kings.bit_length() - 1]
+        else:
+            # Multiple kings. Pick the first one in x88 order.
+            return min(self.get_squares(Piece("K" if color == "w" else "k")),
+                       key=lambda square: square.x88)
 
     @property
     def fen(self):
-        """The FEN string representing the position."""
-        # Board setup.
-        empty = 0
-        fen = ""
-        for y in range(7, -1, -1):
-            for x in range(0, 8):
-                square = Square.from_x_and_y(x, y)
-
-                # Add pieces.
-                if not self[square]:
-                    empty += 1
-                else:
-                    if empty > 0:
-                        fen += str(empty)
-                        empty = 0
-                    fen += self[square].symbol
-
-            # Boarder of the board.
-            if empty > 0:
-                fen += str(empty)
-            if not (x == 7 and y == 0):
-                fen += "/"
-            empty = 0
-
-        if self.ep_file and self.get_theoretical_ep_right(self.ep_file):
-            ep_square = self.ep_file + ("3" if self.turn == "b" else "6")
-        else:
-            ep_square = "-"
-
-        # Join the parts together.
-        return " ".join([
-            fen,
-            self.turn,
-            self.__castling if self.__castling else "-",
-            ep_square,
-            str(self.half_moves),
-            str(self.__ply)])
+        """The FEN string representing the position. It is cached until
+        the position changes."""
+        try:
+            return self.__cache["fen"]
+        except KeyError:
+            fen = self.__cache["fen"] = " ".join([
+                self.__get_board_fen(),
+                self.__turn,
+                self.__castling if self.__castling else "-",
+                self.__get_ep_square(),
+                str(self.__half_moves),
+                str(self.__ply)])
+            return fen
 
     @fen.setter
     def fen(self, fen):
@@ -1055,11 +1811,146 @@ class Position(object):
         if len(tokens) != 6:
             raise FenError("A FEN does not consist of 6 parts.")
 
-        # Check that the position part is valid.
-        rows = tokens[0].split("/")
-        assert len(rows) == 8
+        if not Position.__half_moves_regex.match(tokens[4]):
+            raise FenError("Half move part of the FEN is invalid.")
+        if not Position.__ply_regex.match(tokens[5]):
+            raise FenError("Ply part of the FEN is invalid.")
+
+        self.__set_fen_parts(tokens[0], tokens[1], tokens[2], tokens[3],
+                             int(tokens[4]), int(tokens[5]))
+
+    def get_epd(self, operations=None):
+        """Gets an `EPD <http://en.wikipedia.org/wiki/Extended_Position_Description>`_
+        of the position.
+
+        :param operations:
+            Optional. A dictionary of EPD operations, keyed by opcode.
+            Operands can be given as a single value or a list of
+            values. Strings with spaces are quoted.
+
+        :return:
+            The EPD string. Unlike a FEN it has no move counters.
+        """
+        epd = " ".join([
+            self.__get_board_fen(),
+            self.__turn,
+            self.__castling if self.__castling else "-",
+            self.__get_ep_square()])
+
+        if operations:
+            for opcode, operands in sorted(operations.items()):
+                if not isinstance(operands, (list, tuple)):
+                    operands = [operands]
+                epd += " " + opcode
+                for operand in operands:
+                    operand = str(operand)
+                    if not operand or " " in operand or ";" in operand:
+                        operand = "\"" + operand + "\""
+                    epd += " " + operand
+                epd += ";"
+
+        return epd
+
+    def set_epd(self, epd):
+        """Sets the position from an `EPD <http://en.wikipedia.org/wiki/Extended_Position_Description>`_.
+
+        The move counters are taken from the `hmvc` and `fmvn`
+        operations or reset.
+
+        :param epd:
+            The EPD string.
+
+        :return:
+            A dictionary of the EPD operations, mapping opcodes to lists
+            of operands. Quotes around operands are removed.
+
+        :raise FenError:
+            If the EPD is invalid.
+        """
+        tokens = epd.split(None, 4)
+        if len(tokens) < 4:
+            raise FenError("An EPD does not consist of at least 4 parts.")
+
+        # Parse the operations.
+        operations = dict()
+        if len(tokens) == 5:
+            position = 0
+            rest = tokens[4]
+            while position < len(rest) and not rest[position:].isspace():
+                match = Position.__epd_operation_regex.match(rest, position)
+                if not match or match.end() == position:
+                    raise FenError("Operations part of the EPD is invalid.")
+                operations[match.group(1)] = [
+                    unquoted or quoted for quoted, unquoted in
+                    Position.__epd_operand_regex.findall(match.group(2))]
+                position = match.end()
+
+        half_moves = operations.get("hmvc", ["0"])[0]
+        if not Position.__half_moves_regex.match(half_moves):
+            raise FenError("Half move operation of the EPD is invalid.")
+        ply = operations.get("fmvn", ["1"])[0]
+        if not Position.__ply_regex.match(ply):
+            raise FenError("Ply operation of the EPD is invalid.")
+
+        self.__set_fen_parts(tokens[0], tokens[1], tokens[2], tokens[3],
+                             int(half_moves), int(ply))
+        return operations
+
+    def __get_board_fen(self):
+        rows = []
+        board = self.__board
+        for y in range(7, -1, -1):
+            row = ""
+            empty = 0
+            for piece in board[8 * y:8 * y + 8]:
+                if not piece:
+                    empty += 1
+                else:
+                    if empty:
+                        row += str(empty)
+                        empty = 0
+                    row += piece.symbol
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        return "/".join(rows)
+
+    def __get_ep_square(self):
+        if self.__ep_file and self.get_theoretical_ep_right(self.__ep_file):
+            return self.__ep_file + ("3" if self.__turn == "b" else "6")
+        else:
+            return "-"
+
+    def __set_fen_parts(self, board_part, turn, castling, ep_square,
+                        half_moves, ply):
+        # Validate everything before changing the position.
+        board = self.__decode_board_fen(board_part)
+        if not turn in ["w", "b"]:
+            raise FenError(
+                "Turn part of the FEN is invalid: Expected b or w.")
+        if not Position.__castling_regex.match(castling):
+            raise FenError("Castling part of the FEN is invalid.")
+        if not Position.__ep_regex.match(ep_square):
+            raise FenError("En-passant part of the FEN is invalid.")
+
+        # Replace the whole position. Moves made before can not be
+        # taken back.
+        self.__init_state(board, turn, "" if castling == "-" else castling,
+                          None if ep_square == "-" else ep_square[0],
+                          half_moves, ply)
+
+    def __decode_board_fen(self, board_part):
+        # Decodes the position part of a FEN in a single pass to a list
+        # of pieces indexed by `Square.index`.
+        rows = board_part.split("/")
+        if len(rows) != 8:
+            raise FenError(
+                "Position part of the FEN is invalid: Expected 8 rows.")
+
+        board = [None] * 64
+        y = 7
         for row in rows:
-            field_sum = 0
+            x = 0
             previous_was_number = False
             for char in row:
                 if char in "12345678":
@@ -1067,63 +1958,25 @@ class Position(object):
                         raise FenError(
                             "Position part of the FEN is invalid: "
                             "Multiple numbers immediately after each other.")
-                    field_sum += int(char)
+                    x += int(char)
                     previous_was_number = True
                 elif char in "pnbrkqPNBRKQ":
-                    field_sum += 1
+                    if x < 8:
+                        board[x + 8 * y] = Piece(char)
+                    x += 1
                     previous_was_number = False
                 else:
                     raise FenError(
                         "Position part of the FEN is invalid: "
                         "Invalid character in the position part of the FEN.")
 
-            if field_sum != 8:
-                FenError(
+            if x != 8:
+                raise FenError(
                     "Position part of the FEN is invalid: "
                     "Row with invalid length.")
+            y -= 1
 
-
-        # Check that the other parts are valid.
-        if not tokens[1] in ["w", "b"]:
-            raise FenError(
-                "Turn part of the FEN is invalid: Expected b or w.")
-        if not re.compile(r"^(KQ?k?q?|Qk?q?|kq?|q|-)$").match(tokens[2]):
-            raise FenError("Castling part of the FEN is invalid.")
-        if not re.compile(r"^(-|[a-h][36])$").match(tokens[3]):
-            raise FenError("En-passant part of the FEN is invalid.")
-        if not re.compile(r"^(0|[1-9][0-9]*)$").match(tokens[4]):
-            raise FenError("Half move part of the FEN is invalid.")
-        if not re.compile(r"^[1-9][0-9]*$").match(tokens[5]):
-            raise FenError("Ply part of the FEN is invalid.")
-
-        # Set pieces on the board.
-        self.__board = [None] * 128
-        i = 0
-        for symbol in tokens[0]:
-            if symbol == "/":
-                i += 8
-            elif symbol in "12345678":
-                i += int(symbol)
-            else:
-                self.__board[i] = Piece(symbol)
-                i += 1
-
-        # Set the turn.
-        self.__turn = tokens[1]
-
-        # Set the castling rights.
-        for type in ["K", "Q", "k", "q"]:
-            self.set_castling_right(type, type in tokens[2])
-
-        # Set the en-passant file.
-        if tokens[3] == "-":
-            self.__ep_file = None
-        else:
-            self.__ep_file = tokens[3][0]
-
-        # Set the move counters.
-        self.__half_moves = int(tokens[4])
-        self.__ply = int(tokens[5])
+        return board
 
     def __validate():
         # TODO: Rewrite and make public.
@@ -1151,118 +2004,647 @@ class Position(object):
 
         :param color: `"w"` or `"b"`.
         """
-        square = self.get_king(color)
-        if square:
-            return self.is_attacked(opposite_color(color), square)
+        key = ("king_attacked", color)
+        try:
+            return self.__cache[key]
+        except KeyError:
+            pass
+
+        kings = self.__bitboards["K" if color == "w" else "k"]
+        opponent = opposite_color(color)
+        if not kings:
+            is_attacked = False
+        elif ("attacks", opponent) in self.__cache:
+            is_attacked = bool(
+                self.__cache[("attacks", opponent)] &
+                BB_SQUARES[self.get_king(color).index])
         else:
-            return False
+            is_attacked = self.__is_attacked_by(
+                opponent, self.get_king(color).index, self.__occupied)
+
+        self.__cache[key] = is_attacked
+        return is_attacked
+
+    def __generate_pseudo_legal_targets(self, from_mask=BB_ALL, to_mask=BB_ALL):
+        # Yields the piece, the source index and a bitboard of target
+        # squares for every piece of the current player, covering all
+        # pseudo legal moves except en-passant and castling.
+        turn = self.__turn
+        own = self.__occupied_co[turn]
+        enemy = self.__occupied_co[opposite_color(turn)]
+        occupied = self.__occupied
+
+        if turn == "w":
+            pawn = Piece("P")
+            forward = 8
+            second_rank = BB_RANKS[1]
+            backrank = BB_RANKS[7]
+        else:
+            pawn = Piece("p")
+            forward = -8
+            second_rank = BB_RANKS[6]
+            backrank = BB_RANKS[0]
+
+        # Pawn moves.
+        pawn_attacks = BB_PAWN_ATTACKS[turn]
+        for source in scan_forward(self.__bitboards[pawn.symbol] & ~backrank & from_mask):
+            # Captures.
+            targets = pawn_attacks[source] & enemy
+
+            # Single square ahead. Do not capture.
+            target = source + forward
+            if not occupied & BB_SQUARES[target]:
+                targets |= BB_SQUARES[target]
+
+                # Two squares ahead. Do not capture.
+                if BB_SQUARES[source] & second_rank:
+                    target += forward
+                    if not occupied & BB_SQUARES[target]:
+                        targets |= BB_SQUARES[target]
+
+            targets &= to_mask
+            if targets:
+                yield pawn, source, targets
+
+        # Other pieces.
+        to_mask &= ~own
+        for type in "nbrqk":
+            piece = Piece.from_color_and_type(turn, type)
+            for source in scan_forward(self.__bitboards[piece.symbol] & from_mask):
+                targets = piece_attacks(piece, source, occupied) & to_mask
+                if targets:
+                    yield piece, source, targets
+
+    def __generate_pseudo_legal_specials(self, from_mask=BB_ALL, to_mask=BB_ALL):
+        # Yields the piece, the source index and the target index of
+        # pseudo legal en-passant captures and castling moves.
+        turn = self.__turn
+        opponent = opposite_color(turn)
+        occupied = self.__occupied
+
+        # En-passant, if a pawn just moved two squares ahead.
+        if self.__ep_file:
+            if turn == "w":
+                pawn = Piece("P")
+                ep_index = ord(self.__ep_file) - ord("a") + 40
+                victim = ep_index - 8
+            else:
+                pawn = Piece("p")
+                ep_index = ord(self.__ep_file) - ord("a") + 16
+                victim = ep_index + 8
+
+            if (BB_SQUARES[ep_index] & to_mask and
+                    not occupied & BB_SQUARES[ep_index] and
+                    self.__board[victim] == Piece.from_color_and_type(opponent, "p")):
+                sources = (BB_PAWN_ATTACKS[opponent][ep_index] &
+                           self.__bitboards[pawn.symbol] & from_mask)
+                for source in scan_forward(sources):
+                    yield pawn, source, ep_index
+
+        king = self.get_king(turn)
+        if not king or not BB_SQUARES[king.index] & from_mask:
+            return
+        of = king.index
+        piece = self.__board[of]
+
+        # King-side castling.
+        k = "k" if turn == "b" else "K"
+        if self.get_castling_right(k):
+            to = of + 2
+            if ((of & 7) <= 5 and BB_SQUARES[to] & to_mask and
+                    not occupied & (BB_SQUARES[of + 1] | BB_SQUARES[to]) and
+                    not self.is_check() and
+                    not self.__is_attacked_by(opponent, of + 1, occupied) and
+                    not self.__is_attacked_by(opponent, to, occupied)):
+                yield piece, of, to
+
+        # Queen-side castling.
+        q = "q" if turn == "b" else "Q"
+        if self.get_castling_right(q):
+            to = of - 2
+            if ((of & 7) >= 3 and BB_SQUARES[to] & to_mask and
+                    not occupied & (BB_SQUARES[of - 1] | BB_SQUARES[of - 2] | BB_SQUARES[of - 3]) and
+                    not self.is_check() and
+                    not self.__is_attacked_by(opponent, of - 1, occupied) and
+                    not self.__is_attacked_by(opponent, to, occupied)):
+                yield piece, of, to
+
+    def __generate_legal_targets(self, from_mask=BB_ALL, to_mask=BB_ALL):
+        # Like __generate_pseudo_legal_targets(), but the targets only
+        # include legal moves. Legal en-passant captures and castling
+        # moves are included as single targets.
+        turn = self.__turn
+        kings = self.__bitboards["K" if turn == "w" else "k"]
+
+        if not kings or kings & (kings - 1):
+            # Without exactly one king, fall back to trying each move.
+            for piece, source, targets in self.__generate_pseudo_legal_targets(from_mask, to_mask):
+                legal_targets = BB_VOID
+                for target in scan_forward(targets):
+                    if self.__is_safe(Move(SQUARES[source], SQUARES[target])):
+                        legal_targets |= BB_SQUARES[target]
+                if legal_targets:
+                    yield piece, source, legal_targets
+        else:
+            king = kings.bit_length() - 1
+            opponent = opposite_color(turn)
+            occupied = self.__occupied
+            own = self.__occupied_co[turn]
+
+            # Pieces giving check. Unless in double check, other pieces
+            # must capture the checker or block the check.
+            checkers = self.__attackers_mask(opponent, king, occupied)
+            if not checkers:
+                check_mask = BB_ALL
+            elif not checkers & (checkers - 1):
+                checker = checkers.bit_length() - 1
+                check_mask = checkers | BB_BETWEEN[king][checker]
+            else:
+                check_mask = BB_VOID
+                from_mask &= kings
+
+            # Pinned pieces may only move along the line of the pin.
+            pin_masks = dict()
+            snipers = (
+                (BB_ROOK_RAYS[king] & self.__orthogonal_sliders(opponent)) |
+                (BB_BISHOP_RAYS[king] & self.__diagonal_sliders(opponent)))
+            for sniper in scan_forward(snipers):
+                blockers = BB_BETWEEN[king][sniper] & occupied
+                if blockers and blockers & own and not blockers & (blockers - 1):
+                    pin_masks[blockers.bit_length() - 1] = BB_LINE[king][sniper]
+
+            for piece, source, targets in self.__generate_pseudo_legal_targets(from_mask, to_mask):
+                if source == king:
+                    targets &= ~self.__king_danger(opponent, occupied ^ kings)
+                else:
+                    targets &= check_mask
+                    if source in pin_masks:
+                        targets &= pin_masks[source]
+                if targets:
+                    yield piece, source, targets
+
+        # Castling moves are already checked for attacked squares.
+        for piece, source, target in self.__generate_pseudo_legal_specials(from_mask, to_mask):
+            if piece.type == "k" or self.__is_ep_safe(source, target):
+                yield piece, source, BB_SQUARES[target]
+
+    def __is_ep_safe(self, source, target):
+        # Checks that an en-passant capture does not leave the king in
+        # check. Both pawns leave their rank at once, which may uncover
+        # a slider, and the captured pawn may have been giving check.
+        turn = self.__turn
+        kings = self.__bitboards["K" if turn == "w" else "k"]
+        if not kings or kings & (kings - 1):
+            return self.__is_safe(Move(SQUARES[source], SQUARES[target]))
+
+        victim = BB_SQUARES[target - 8 if turn == "w" else target + 8]
+        occupied = (self.__occupied ^ BB_SQUARES[source] ^ victim) | BB_SQUARES[target]
+        attackers = self.__attackers_mask(
+            opposite_color(turn), kings.bit_length() - 1, occupied)
+        return not attackers & ~victim
+
+    def __is_safe(self, move):
+        # Tries a pseudo legal move and checks that the king of the
+        # player is not attacked afterwards.
+        turn = self.__turn
+        self.make_move(move, False)
+        is_safe = not self.is_king_attacked(turn)
+        self.unmake_move()
+        return is_safe
+
+    def __attackers_mask(self, color, index, occupied):
+        # All pieces of the given color attacking the square, with the
+        # given occupancy blocking sliding pieces.
+        bitboards = self.__bitboards
+        if color == "w":
+            pawns, knights, king = bitboards["P"], bitboards["N"], bitboards["K"]
+        else:
+            pawns, knights, king = bitboards["p"], bitboards["n"], bitboards["k"]
+        return (
+            (BB_PAWN_ATTACKS[opposite_color(color)][index] & pawns) |
+            (BB_KNIGHT_ATTACKS[index] & knights) |
+            (BB_KING_ATTACKS[index] & king) |
+            (rook_attacks(index, occupied) & self.__orthogonal_sliders(color)) |
+            (bishop_attacks(index, occupied) & self.__diagonal_sliders(color)))
+
+    def __is_attacked_by(self, color, index, occupied):
+        # Looks outward from the square for attackers of the given
+        # color. Cheap tests come first and the first attacker found
+        # ends the search.
+        bitboards = self.__bitboards
+        if color == "w":
+            if BB_KNIGHT_ATTACKS[index] & bitboards["N"]:
+                return True
+            if BB_PAWN_ATTACKS["b"][index] & bitboards["P"]:
+                return True
+            if BB_KING_ATTACKS[index] & bitboards["K"]:
+                return True
+            queens = bitboards["Q"]
+            rooks = bitboards["R"] | queens
+            bishops = bitboards["B"] | queens
+        else:
+            if BB_KNIGHT_ATTACKS[index] & bitboards["n"]:
+                return True
+            if BB_PAWN_ATTACKS["w"][index] & bitboards["p"]:
+                return True
+            if BB_KING_ATTACKS[index] & bitboards["k"]:
+                return True
+            queens = bitboards["q"]
+            rooks = bitboards["r"] | queens
+            bishops = bitboards["b"] | queens
+
+        # Only look along the rays if a slider could be on them at all.
+        if rooks & BB_ROOK_RAYS[index] and rook_attacks(index, occupied) & rooks:
+            return True
+        if bishops & BB_BISHOP_RAYS[index] and bishop_attacks(index, occupied) & bishops:
+            return True
+        return False
+
+    def __orthogonal_sliders(self, color):
+        if color == "w":
+            return self.__bitboards["R"] | self.__bitboards["Q"]
+        else:
+            return self.__bitboards["r"] | self.__bitboards["q"]
+
+    def __diagonal_sliders(self, color):
+        if color == "w":
+            return self.__bitboards["B"] | self.__bitboards["Q"]
+        else:
+            return self.__bitboards["b"] | self.__bitboards["q"]
+
+    def __king_danger(self, color, occupied):
+        # All squares attacked by the given color. The king of the
+        # other player is expected to be removed from the occupancy, so
+        # that sliding pieces attack the squares behind it.
+        danger = BB_VOID
+        for index in scan_forward(self.__occupied_co[color]):
+            danger |= piece_attacks(self.__board[index], index, occupied)
+        return danger
+
+    def __expand_moves(self, piece, source, targets):
+        # Yields move objects for the targets of a piece.
+        square = SQUARES[source]
+        if piece.type == "p" and targets & (BB_RANKS[0] | BB_RANKS[7]):
+            for target in scan_forward(targets):
+                for promote_to in "bnrq":
+                    yield Move(square, SQUARES[target], promote_to)
+        else:
+            for target in scan_forward(targets):
+                yield Move(square, SQUARES[target])
+
+    def __expand_move_ints(self, piece, source, targets):
+        # Yields integer encoded moves for the targets of a piece, in
+        # the same order as __expand_moves().
+        if piece.type == "p" and targets & (BB_RANKS[0] | BB_RANKS[7]):
+            for target in scan_forward(targets):
+                move = source | target << 6
+                yield move | 2 << 12
+                yield move | 1 << 12
+                yield move | 3 << 12
+                yield move | 4 << 12
+        else:
+            for target in scan_forward(targets):
+                yield source | target << 6
 
     def get_pseudo_legal_moves(self):
         """:yield: Pseudo legal moves in the current position."""
-        # TODO: Maximum line length should be 80 characters.
-        PAWN_OFFSETS = {
-            "b": [16, 32, 17, 15],
-            "w": [-16, -32, -17, -15]
-        }
+        for piece, source, targets in self.__generate_pseudo_legal_targets():
+            for move in self.__expand_moves(piece, source, targets):
+                yield move
 
-        PIECE_OFFSETS = {
-            "n": [-18, -33, -31, -14, 18, 33, 31, 14],
-            "b": [-17, -15, 17, 15],
-            "r": [-16, 1, 16, -1],
-            "q": [-17, -16, -15, 1, 17, 16, 15, -1],
-            "k": [-17, -16, -15, 1, 17, 16, 15, -1]
-        }
+        for piece, source, target in self.__generate_pseudo_legal_specials():
+            yield Move(SQUARES[source], SQUARES[target])
 
-        for x88, piece in enumerate(self.__board):
-            # Skip pieces of the opponent.
-            if not piece or piece.color != self.turn:
-                continue
+    def get_pseudo_legal_move_ints(self):
+        """:yield: Pseudo legal moves in the current position, encoded
+        as integers. See `Move.to_int()`."""
+        for piece, source, targets in self.__generate_pseudo_legal_targets():
+            for move in self.__expand_move_ints(piece, source, targets):
+                yield move
+
+        for piece, source, target in self.__generate_pseudo_legal_specials():
+            yield source | target << 6
+
+    def get_legal_moves(self):
+        """:yield: All legal moves in the current position.
+
+        Check evasions, pinned pieces and the squares the king can not
+        step on are computed once per position. En-passant captures and
+        castling moves are tried on the board.
+
+        If the position has a `legal_move_cache` the moves are looked
+        up there first.
+        """
+        if self.__legal_move_cache is not None:
+            for move in self.__get_legal_move_tuple():
+                yield move
+        else:
+            for move in self.__generate_legal_moves():
+                yield move
+
+    def __generate_legal_moves(self):
+        for piece, source, targets in self.__generate_legal_targets():
+            for move in self.__expand_moves(piece, source, targets):
+                yield move
+
+    def __get_legal_move_tuple(self):
+        # The legal moves as a tuple, from the legal move cache if
+        # there is one.
+        cache = self.__legal_move_cache
+        if cache is None:
+            return tuple(self.__generate_legal_moves())
+
+        key = self.get_zobrist_hash()
+        moves = cache.get(key)
+        if moves is None:
+            moves = tuple(self.__generate_legal_moves())
+            cache[key] = moves
+        return moves
+
+    def get_legal_moves_from(self, square):
+        """Gets the legal moves of the piece on a single square, without
+        generating the moves of the other pieces.
+
+        :param square:
+            The source square, as a square object, name or x88 index.
+
+        :yield:
+            The legal moves starting on the square. None if the square
+            is empty or the piece is not on turn.
+        """
+        from_mask = BB_SQUARES[self.__get_square_index(square)]
+        for piece, source, targets in self.__generate_legal_targets(from_mask):
+            for move in self.__expand_moves(piece, source, targets):
+                yield move
+
+    def is_legal(self, move):
+        """Checks if a move is legal, only generating moves of the moving
+        piece to the target square.
+
+        :param move:
+            The move to check.
+
+        :return:
+            A boolean.
+        """
+        if self.__legal_move_cache is not None:
+            return move in self.__get_legal_move_tuple()
+
+        move = move.to_int()
+        from_mask = BB_SQUARES[move & 63]
+        to_mask = BB_SQUARES[move >> 6 & 63]
+        for piece, source, targets in self.__generate_legal_targets(from_mask, to_mask):
+            if move in self.__expand_move_ints(piece, source, targets):
+                return True
+        return False
+
+    def get_legal_captures(self):
+        """Generates only captures and promotions, for example for a
+        quiescence search. Together with
+        `Position.get_legal_quiet_moves()` these are all legal moves.
+
+        :yield:
+            Legal captures, then promotions without capture, then
+            en-passant captures.
+        """
+        turn = self.__turn
+        pawns = self.__bitboards["P" if turn == "w" else "p"]
+        promotion_rank = BB_RANKS[7] if turn == "w" else BB_RANKS[0]
+
+        stages = [
+            (BB_ALL, self.__occupied_co[opposite_color(turn)]),
+            (pawns, promotion_rank & ~self.__occupied)]
+        if self.__ep_file:
+            stages.append((pawns, self.__get_ep_mask()))
+
+        for from_mask, to_mask in stages:
+            for piece, source, targets in self.__generate_legal_targets(from_mask, to_mask):
+                for move in self.__expand_moves(piece, source, targets):
+                    yield move
+
+    def get_legal_quiet_moves(self):
+        """Generates only moves that neither capture nor promote,
+        including castling moves.
+
+        :yield:
+            Legal quiet moves of pieces, then of pawns.
+        """
+        turn = self.__turn
+        pawns = self.__bitboards["P" if turn == "w" else "p"]
+        promotion_rank = BB_RANKS[7] if turn == "w" else BB_RANKS[0]
+        empty = ~self.__occupied
+
+        stages = [
+            (self.__occupied_co[turn] & ~pawns, empty),
+            (pawns, empty & ~promotion_rank & ~self.__get_ep_mask())]
+
+        for from_mask, to_mask in stages:
+            for piece, source, targets in self.__generate_legal_targets(from_mask, to_mask):
+                for move in self.__expand_moves(piece, source, targets):
+                    yield move
 
-            square = Square.from_x88(x88)
+    def get_legal_checks(self):
+        """Generates only moves that give check.
+
+        Squares from which each piece would attack the opposing king and
+        pieces that would uncover an attack by moving are computed once.
+        Only castling moves, en-passant captures and promotions are
+        tried on the board.
+
+        :yield:
+            Legal moves giving check.
+        """
+        turn = self.__turn
+        opponent = opposite_color(turn)
+        kings = self.__bitboards["k" if turn == "w" else "K"]
+
+        if not kings or kings & (kings - 1):
+            # Without exactly one king, try each move.
+            for move in self.__generate_legal_moves():
+                if self.__gives_check(move):
+                    yield move
+            return
 
-            # Pawn moves.
+        king = kings.bit_length() - 1
+        occupied = self.__occupied
+        ep_mask = self.__get_ep_mask()
+        promotion_rank = BB_RANKS[7] if turn == "w" else BB_RANKS[0]
+
+        # Own pieces between an own slider and the opposing king give
+        # check by leaving the line.
+        discoverers = dict()
+        snipers = (
+            (BB_ROOK_RAYS[king] & self.__orthogonal_sliders(turn)) |
+            (BB_BISHOP_RAYS[king] & self.__diagonal_sliders(turn)))
+        for sniper in scan_forward(snipers):
+            blockers = BB_BETWEEN[king][sniper] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & self.__occupied_co[turn]:
+                discoverers[blockers.bit_length() - 1] = BB_LINE[king][sniper]
+
+        for piece, source, targets in self.__generate_legal_targets():
+            # Castling, en-passant and promotions.
+            specials = BB_VOID
             if piece.type == "p":
-                # Single square ahead. Do not capture.
-                target = Square.from_x88(x88 + PAWN_OFFSETS[self.turn][0])
-                if not self[target]:
-                    # Promotion.
-                    if target.is_backrank():
-                        for promote_to in "bnrq":
-                            yield Move(square, target, promote_to)
-                    else:
-                        yield Move(square, target)
-
-                    # Two squares ahead. Do not capture.
-                    if (self.turn == "w" and square.rank == 2) or (self.turn == "b" and square.rank == 7):
-                        target = Square.from_x88(square.x88 + PAWN_OFFSETS[self.turn][1])
-                        if not self[target]:
-                            yield Move(square, target)
-
-                # Pawn captures.
-                for j in [2, 3]:
-                   target_index = square.x88 + PAWN_OFFSETS[self.turn][j]
-                   if target_index & 0x88:
-                       continue
-                   target = Square.from_x88(target_index)
-                   if self[target] and self[target].color != self.turn:
-                       # Promotion.
-                       if target.is_backrank():
-                           for promote_to in "bnrq":
-                               yield Move(square, target, promote_to)
-                       else:
-                           yield Move(square, target)
-                   # En-passant.
-                   elif not self[target] and target.file == self.ep_file:
-                       yield Move(square, target)
-            # Other pieces.
+                specials = targets & (ep_mask | promotion_rank)
+                check_targets = BB_PAWN_ATTACKS[opponent][king]
+            elif piece.type == "k":
+                specials = targets & ~BB_KING_ATTACKS[source]
+                check_targets = BB_VOID
             else:
-                for offset in PIECE_OFFSETS[piece.type]:
-                    target_index = square.x88
-                    while True:
-                        target_index += offset
-                        if target_index & 0x88:
-                            break
-                        target = Square.from_x88(target_index)
-                        if not self[target]:
-                            yield Move(square, target)
-                        else:
-                            if self[target].color == self.turn:
-                                break
-                            yield Move(square, target)
-                            break
-
-                        # Knight and king do not go multiple times in their
-                        # direction.
-                        if piece.type in ["n", "k"]:
-                            break
-
-        opponent = opposite_color(self.turn)
+                # Sliders may move away from the king along the line
+                # they attack it on.
+                check_targets = piece_attacks(
+                    piece, king, occupied & ~BB_SQUARES[source])
 
-        # King-side castling.
-        k = "k" if self.turn == "b" else "K"
-        if self.get_castling_right(k):
-            of = self.get_king(self.turn).x88
-            to = of + 2
-            if not self[of + 1] and not self[to] and not self.is_check() and not self.is_attacked(opponent, Square.from_x88(of + 1)) and not self.is_attacked(opponent, Square.from_x88(to)):
-                yield Move(Square.from_x88(of), Square.from_x88(to))
+            if source in discoverers:
+                check_targets |= ~discoverers[source]
 
-        # Queen-side castling
-        q = "q" if self.turn == "b" else "Q"
-        if self.get_castling_right(q):
-            of = self.get_king(self.turn).x88
-            to = of - 2
+            for move in self.__expand_moves(piece, source, targets & check_targets & ~specials):
+                yield move
+            for move in self.__expand_moves(piece, source, specials):
+                if self.__gives_check(move):
+                    yield move
 
-            if not self[of - 1] and not self[of - 2] and not self[of - 3] and not self.is_check() and not self.is_attacked(opponent, Square.from_x88(of - 1)) and not self.is_attacked(opponent, Square.from_x88(to)):
-                yield Move(Square.from_x88(of), Square.from_x88(to))
+    def get_legal_evasions(self):
+        """Generates the moves out of check.
 
-    def get_legal_moves(self):
-        """:yield: All legal moves in the current position."""
-        for move in self.get_pseudo_legal_moves():
-            potential_position = self.copy()
-            potential_position.make_move(move, False)
-            if not potential_position.is_king_attacked(self.turn):
+        :yield:
+            All legal moves if the side to move is in check, otherwise
+            nothing.
+        """
+        if self.is_check():
+            for move in self.__generate_legal_moves():
+                yield move
+
+    def __get_ep_mask(self):
+        # The square a pawn could capture en-passant on, if any.
+        if not self.__ep_file:
+            return BB_VOID
+        rank = 5 if self.__turn == "w" else 2
+        return BB_SQUARES[ord(self.__ep_file) - ord("a") + 8 * rank]
+
+    def __gives_check(self, move):
+        # Tries a legal move on a private copy of the position, so that
+        # this position is only read.
+        position = self.copy()
+        position.make_move(move, False)
+        return position.is_check()
+
+    @property
+    def legal_move_cache(self):
+        """Optional. A `LegalMoveCache` used to look up the legal moves
+        of the position, or `None`. Copies of the position use the same
+        cache. Defaults to `None`."""
+        return self.__legal_move_cache
+
+    @legal_move_cache.setter
+    def legal_move_cache(self, value):
+        if value is not None and not isinstance(value, LegalMoveCache):
+            raise TypeError(
+                "Expected LegalMoveCache or None, got: %s." % repr(value))
+        self.__legal_move_cache = value
+
+    def get_legal_move_ints(self):
+        """:yield: All legal moves in the current position, encoded as
+        integers. See `Move.to_int()`.
+
+        This saves creating move objects, for example when searching
+        or storing moves.
+        """
+        for piece, source, targets in self.__generate_legal_targets():
+            for move in self.__expand_move_ints(piece, source, targets):
                 yield move
 
+    def get_legal_move_array(self):
+        """:return: All legal moves in the current position as an
+        `array.array("H")` of integer encoded moves. See
+        `Move.to_int()`."""
+        return array.array("H", self.get_legal_move_ints())
+
+    def count_legal_moves(self):
+        """Counts the legal moves in the current position, without
+        creating any move objects. Only positions without exactly one
+        king of the side to move fall back to trying moves on the board.
+
+        :return:
+            The number of legal moves, counting each promotion piece.
+        """
+        count = 0
+        promotion_ranks = BB_RANKS[0] | BB_RANKS[7]
+        for piece, source, targets in self.__generate_legal_targets():
+            if piece.type == "p" and targets & promotion_ranks:
+                count += 4 * popcount(targets)
+            else:
+                count += popcount(targets)
+        return count
+
+    def get_mobility(self):
+        """Counts the legal moves of the side to move by type of the
+        moving piece. See `Position.count_legal_moves()`.
+
+        :return:
+            A dictionary mapping each piece type, `"p"`, `"n"`, `"b"`,
+            `"r"`, `"q"` and `"k"`, to its number of legal moves.
+        """
+        mobility = dict.fromkeys("pnbrqk", 0)
+        promotion_ranks = BB_RANKS[0] | BB_RANKS[7]
+        for piece, source, targets in self.__generate_legal_targets():
+            if piece.type == "p" and targets & promotion_ranks:
+                mobility["p"] += 4 * popcount(targets)
+            else:
+                mobility[piece.type] += popcount(targets)
+        return mobility
+
+    def perft(self, depth, hash_table=None):
+        """Counts the leaf nodes of the tree of legal moves. This is
+        mostly useful to test and benchmark the move generator.
+
+        :param depth:
+            The number of half-moves to look ahead.
+        :param hash_table:
+            Optional. A dictionary used to remember the node counts of
+            positions already seen, keyed by Zobrist hash and depth.
+            Pass an empty dictionary to speed up deep counts.
+
+        :return:
+            The number of leaf nodes.
+        """
+        if depth < 1:
+            return 1
+        elif depth == 1:
+            return self.count_legal_moves()
+
+        if hash_table is not None:
+            key = (self.get_zobrist_hash(), depth)
+            if key in hash_table:
+                return hash_table[key]
+
+        nodes = 0
+        for move in self.get_legal_move_array():
+            self.make_move(Move.from_int(move), False)
+            nodes += self.perft(depth - 1, hash_table)
+            self.unmake_move()
+
+        if hash_table is not None:
+            hash_table[key] = nodes
+
+        return nodes
+
+    def divide(self, depth, hash_table=None):
+        """Counts the leaf nodes of the tree of legal moves for each move
+        separately. See `Position.perft()`.
+
+        :return:
+            A dictionary of node counts, keyed by the legal moves in
+            the current position.
+        """
+        counts = dict()
+        for move in list(self.get_legal_moves()):
+            self.make_move(move, False)
+            counts[move] = self.perft(depth - 1, hash_table)
+            self.unmake_move()
+        return counts
+
     def get_attackers(self, color, square):
         """Gets the attackers of a specific square.
 
@@ -1277,85 +2659,9 @@ class Position(object):
         if not color in ["b", "w"]:
             raise KeyError("Invalid color: %s." % repr(color))
 
-        ATTACKS = [
-            20, 0, 0, 0, 0, 0, 0, 24, 0, 0, 0, 0, 0, 0, 20, 0,
-            0, 20, 0, 0, 0, 0, 0, 24, 0, 0, 0, 0, 0, 20, 0, 0,
-            0, 0, 20, 0, 0, 0, 0, 24, 0, 0, 0, 0, 20, 0, 0, 0,
-            0, 0, 0, 20, 0, 0, 0, 24, 0, 0, 0, 20, 0, 0, 0, 0,
-            0, 0, 0, 0, 20, 0, 0, 24, 0, 0, 20, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 20, 2, 24, 2, 20, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 2, 53, 56, 53, 2, 0, 0, 0, 0, 0, 0,
-            24, 24, 24, 24, 24, 24, 56, 0, 56, 24, 24, 24, 24, 24, 24, 0,
-            0, 0, 0, 0, 0, 2, 53, 56, 53, 2, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 20, 2, 24, 2, 20, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 20, 0, 0, 24, 0, 0, 20, 0, 0, 0, 0, 0,
-            0, 0, 0, 20, 0, 0, 0, 24, 0, 0, 0, 20, 0, 0, 0, 0,
-            0, 0, 20, 0, 0, 0, 0, 24, 0, 0, 0, 0, 20, 0, 0, 0,
-            0, 20, 0, 0, 0, 0, 0, 24, 0, 0, 0, 0, 0, 20, 0, 0,
-            20, 0, 0, 0, 0, 0, 0, 24, 0, 0, 0, 0, 0, 0, 20
-        ]
-
-        RAYS = [
-            17, 0, 0, 0, 0, 0, 0, 16, 0, 0, 0, 0, 0, 0, 15, 0,
-            0, 17, 0, 0, 0, 0, 0, 16, 0, 0, 0, 0, 0, 15, 0, 0,
-            0, 0, 17, 0, 0, 0, 0, 16, 0, 0, 0, 0, 15, 0, 0, 0,
-            0, 0, 0, 17, 0, 0, 0, 16, 0, 0, 0, 15, 0, 0, 0, 0,
-            0, 0, 0, 0, 17, 0, 0, 16, 0, 0, 15, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 17, 0, 16, 0, 15, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 17, 16, 15, 0, 0, 0, 0, 0, 0, 0,
-            1, 1, 1, 1, 1, 1, 1, 0, -1, -1, -1, -1, -1, -1, -1, 0,
-            0, 0, 0, 0, 0, 0, -15, -16, -17, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, -15, 0, -16, 0, -17, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, -15, 0, 0, -16, 0, 0, -17, 0, 0, 0, 0, 0,
-            0, 0, 0, -15, 0, 0, 0, -16, 0, 0, 0, -17, 0, 0, 0, 0,
-            0, 0, -15, 0, 0, 0, 0, -16, 0, 0, 0, 0, -17, 0, 0, 0,
-            0, -15, 0, 0, 0, 0, 0, -16, 0, 0, 0, 0, 0, -17, 0, 0,
-            -15, 0, 0, 0, 0, 0, 0, -16, 0, 0, 0, 0, 0, 0, -17
-        ]
-
-        SHIFTS = {
-            "p": 0,
-            "n": 1,
-            "b": 2,
-            "r": 3,
-            "q": 4,
-            "k": 5
-        }
-
-        for x88, piece in enumerate(self.__board):
-            if not piece or piece.color != color:
-                continue
-            source = Square.from_x88(x88)
-
-            difference = source.x88 - square.x88
-            index = difference + 119
-
-            if ATTACKS[index] & (1 << SHIFTS[piece.type]):
-                # Handle pawns.
-                if piece.type == "p":
-                    if difference > 0:
-                        if piece.color == "w":
-                            yield source
-                    else:
-                        if piece.color == "b":
-                            yield source
-                    continue
-
-                # Handle knights and king.
-                if piece.type in ["n", "k"]:
-                    yield source
-
-                # Handle the others.
-                offset = RAYS[index]
-                j = source.x88 + offset
-                blocked = False
-                while j != square.x88:
-                    if self[j]:
-                        blocked = True
-                        break
-                    j += offset
-                if not blocked:
-                    yield source
+        for index in scan_forward(self.__attackers_mask(
+                color, self.__get_square_index(square), self.__occupied)):
+            yield SQUARES[index]
 
     def is_attacked(self, color, square):
         """Checks whether a square is attacked.
@@ -1369,37 +2675,127 @@ class Position(object):
             A boolean indicating whether the given square is attacked
             by the player of the given color.
         """
+        if not color in ["b", "w"]:
+            raise KeyError("Invalid color: %s." % repr(color))
+        index = self.__get_square_index(square)
+
+        # Use the attack map if it is already there. Otherwise look
+        # outward from the square and stop at the first attacker.
+        attacks = self.__cache.get(("attacks", color))
+        if attacks is not None:
+            return bool(attacks & BB_SQUARES[index])
+        return self.__is_attacked_by(color, index, self.__occupied)
+
+    def get_attacks(self, color):
+        """Gets all squares attacked by the pieces of a player. The
+        result is cached until the position changes.
+
+        :param color:
+            `"w"` or `"b"`.
+
+        :return:
+            A bitboard with a bit set for every attacked square.
+        """
+        if not color in ["b", "w"]:
+            raise KeyError("Invalid color: %s." % repr(color))
+
+        key = ("attacks", color)
         try:
-            self.get_attackers(color, square).next()
-            return True
-        except StopIteration:
-            return False
+            return self.__cache[key]
+        except KeyError:
+            attacks = BB_VOID
+            for index in scan_forward(self.__occupied_co[color]):
+                attacks |= piece_attacks(self.__board[index], index, self.__occupied)
+            self.__cache[key] = attacks
+            return attacks
+
+    def get_attacker_count(self, color, square):
+        """Counts the pieces of a player attacking a square. The counts
+        are cached until the position changes.
+
+        :param color:
+            `"w"` or `"b"`.
+        :param square:
+            The square to check.
+
+        :return:
+            The number of attackers.
+        """
+        if not color in ["b", "w"]:
+            raise KeyError("Invalid color: %s." % repr(color))
+
+        key = ("attacker_counts", color)
+        try:
+            counts = self.__cache[key]
+        except KeyError:
+            counts = [0] * 64
+            for index in scan_forward(self.__occupied_co[color]):
+                attacks = piece_attacks(self.__board[index], index, self.__occupied)
+                for target in scan_forward(attacks):
+                    counts[target] += 1
+            self.__cache[key] = counts
+
+        return counts[self.__get_square_index(square)]
 
     def is_check(self):
         """:return: Whether the current player is in check."""
         return self.is_king_attacked(self.turn)
 
+    def status(self):
+        """Evaluates the state of the game in a single pass. The result
+        is cached until the position changes.
+
+        :return:
+            A named tuple with these properties:
+
+            `is_check`:
+                Whether the current player is in check.
+            `is_checkmate`:
+                Whether the current player has been checkmated.
+            `is_stalemate`:
+                Whether the current player is in stalemate.
+            `is_insufficient_material`:
+                Whether there is insufficient material to mate. See
+                `Position.is_insufficient_material()`.
+            `is_fifty_moves`:
+                Whether fifty moves have been made without a capture or
+                a pawn move, so that a player can claim a draw.
+            `is_game_over`:
+                Whether the game is over by checkmate, stalemate or
+                insufficient material.
+        """
+        try:
+            return self.__cache["status"]
+        except KeyError:
+            pass
+
+        is_check = self.is_check()
+        try:
+            self.get_legal_moves().next()
+            has_legal_moves = True
+        except StopIteration:
+            has_legal_moves = False
+        is_insufficient_material = self.__is_insufficient_material()
+
+        status = Status(
+            is_check=is_check,
+            is_checkmate=is_check and not has_legal_moves,
+            is_stalemate=not is_check and not has_legal_moves,
+            is_insufficient_material=is_insufficient_material,
+            is_fifty_moves=self.__half_moves >= 100,
+            is_game_over=not has_legal_moves or is_insufficient_material)
+
+        # Trying moves on the board may have reset the cache.
+        self.__cache["status"] = status
+        return status
+
     def is_checkmate(self):
         """:return: Whether the current player has been checkmated."""
-        if not self.is_check():
-            return False
-        else:
-            try:
-                self.get_legal_moves().next()
-                return False
-            except StopIteration:
-                return True
+        return self.status().is_checkmate
 
     def is_stalemate(self):
         """:return: Whether the current player is in stalemate."""
-        if self.is_check():
-            return False
-        else:
-            try:
-                self.get_legal_moves().next()
-                return False
-            except StopIteration:
-                return True
+        return self.status().is_stalemate
 
     def is_insufficient_material(self):
         """Checks if there is sufficient material to mate.
@@ -1419,28 +2815,25 @@ class Position(object):
         :return:
             Whether there is insufficient material to mate.
         """
-        piece_counts = self.get_piece_counts()
-        if sum(piece_counts.values()) == 2:
+        return self.status().is_insufficient_material
+
+    def __is_insufficient_material(self):
+        bitboards = self.__bitboards
+        count = popcount(self.__occupied)
+        if count == 2:
             # King versus king.
             return True
-        elif sum(piece_counts.values()) == 3:
+
+        bishops = bitboards["B"] | bitboards["b"]
+        if count == 3:
             # King and knight or bishop versus king.
-            if piece_counts["b"] == 1 or piece_counts["n"] == 1:
-                return True
-        elif sum(piece_counts.values()) == 2 + piece_counts["b"]:
-            # Each player with only king and any number of bishops, where all
-            # bishops are on the same color.
-            white_has_bishop = self.get_piece_counts("w")["b"] != 0
-            black_has_bishop = self.get_piece_counts("b")["b"] != 0
-            if white_has_bishop and black_has_bishop:
-                color = None
-                for x88, piece in enumerate(self.__board):
-                    if piece and piece.type == "b":
-                        square = Square.from_x88(x88)
-                        if color != None and color != square.is_light():
-                            return False
-                        color = square.is_light()
-                return True
+            return bool(bishops | bitboards["N"] | bitboards["n"])
+        elif count == 2 + popcount(bishops):
+            # Each player with only king and any number of bishops,
+            # where all bishops are on the same color.
+            if bitboards["B"] and bitboards["b"]:
+                return (not bishops & BB_LIGHT_SQUARES or
+                        not bishops & BB_DARK_SQUARES)
         return False
 
     def is_game_over(self):
@@ -1451,24 +2844,572 @@ class Position(object):
             disregarding that players can agree on a draw, claim a draw
             or resign.
         """
-        return (self.is_checkmate() or self.is_stalemate() or
-                self.is_insufficient_material())
+        return self.status().is_game_over
+
+    def __str__(self):
+        return self.fen
+
+    def __repr__(self):
+        return "Position(%s)" % repr(self.fen)
+
+    def __eq__(self, other):
+        # Compare the incremental hash of pieces, turn and castling
+        # rights first. Only equal candidates need a closer look.
+        if isinstance(other, FrozenPosition):
+            return other == self
+        if not isinstance(other, Position):
+            return False
+        return (self.__zobrist == other.__zobrist and
+                self.__half_moves == other.__half_moves and
+                self.__ply == other.__ply and
+                self.__board == other.__board and
+                self.__turn == other.__turn and
+                self.__castling == other.__castling and
+                self.__get_ep_square() == other.__get_ep_square())
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.get_zobrist_hash())
+
+    def get_zobrist_hash(self):
+        """Gets the Polyglot Zobrist hash of the position.
+
+        The key is kept up to date while the position changes, so this
+        is much cheaper than `ZobristHasher.hash_position(position)` but
+        gives the same result for `POLYGLOT_RANDOM_ARRAY`.
+
+        :return:
+            The hash as a 64 bit integer.
+        """
+        # Only the en-passant file depends on the surrounding pawns and
+        # is looked at here.
+        key = self.__zobrist
+        if self.__ep_file and self.get_theoretical_ep_right(self.__ep_file):
+            key ^= _ZOBRIST_EP_KEYS[self.__ep_file]
+        return key
+
+
+class FrozenPosition(object):
+    """An immutable snapshot of a position, usually created with
+    `Position.freeze()`.
+
+    Frozen positions can be shared between caches and threads without
+    copying and are safe to use as dictionary keys. They compare and
+    hash like positions, but hashing is free because the Zobrist hash
+    is computed once on creation.
+
+    :param board:
+        A sequence of 64 pieces or `None` indexed by `Square.index`.
+    :param turn:
+        Defaults to `"w"`. The side to move.
+    :param castling:
+        Defaults to `""`. The castling rights, like `"KQkq"`.
+    :param ep_file:
+        Defaults to `None`. The en-passant file. It is dropped if no
+        pawn could capture en-passant.
+    :param half_moves:
+        Defaults to `0`. The half-move counter.
+    :param ply:
+        Defaults to `1`. The ply counter.
+    :param zobrist_hash:
+        Optional. The hash as returned by `Position.get_zobrist_hash()`,
+        if it is already known. Computed from the other arguments
+        otherwise.
+
+    >>> import chess
+    >>> frozen = chess.Position().freeze()
+    >>> frozen["e2"]
+    Piece('P')
+    >>> frozen.thaw() == chess.Position()
+    True
+    """
+
+    __slots__ = ("__board", "__turn", "__castling", "__ep_file",
+                 "__half_moves", "__ply", "__zobrist")
+
+    def __new__(cls, board, turn="w", castling="", ep_file=None,
+                half_moves=0, ply=1, zobrist_hash=None):
+        board = tuple(board)
+        if len(board) != 64:
+            raise ValueError("Expected 64 squares, got: %d." % len(board))
+        if not turn in ["w", "b"]:
+            raise ValueError("Expected w or b for turn, got: %s." % repr(turn))
+        if castling != "".join(type for type in "KQkq" if type in castling):
+            raise ValueError(
+                "Expected castling rights like KQkq, got: %s." % repr(castling))
+        if not ep_file in ["a", "b", "c", "d", "e", "f", "g", "h", None]:
+            raise ValueError(
+                "Expected None or a letter between 'a' and 'h' for the "
+                "en-passant file, got: %s." % repr(ep_file))
+
+        # Like positions, ignore en-passant files where no capture is
+        # possible, so that equal positions give equal snapshots.
+        if ep_file and not FrozenPosition.__has_ep_right(board, turn, ep_file):
+            ep_file = None
+
+        # The same key as `Position.get_zobrist_hash()`.
+        zobrist = zobrist_hash
+        if zobrist is None:
+            zobrist = _ZOBRIST_CASTLING_KEYS[castling]
+            for index, piece in enumerate(board):
+                if piece:
+                    zobrist ^= _ZOBRIST_PIECE_KEYS[piece.symbol][index]
+            if turn == "w":
+                zobrist ^= _ZOBRIST_TURN_KEY
+            if ep_file:
+                zobrist ^= _ZOBRIST_EP_KEYS[ep_file]
+
+        frozen = super(FrozenPosition, cls).__new__(cls)
+        frozen.__board = board
+        frozen.__turn = turn
+        frozen.__castling = castling
+        frozen.__ep_file = ep_file
+        frozen.__half_moves = half_moves
+        frozen.__ply = ply
+        frozen.__zobrist = zobrist
+        return frozen
+
+    @staticmethod
+    def __has_ep_right(board, turn, file):
+        # See `Position.get_theoretical_ep_right()`.
+        f = ord(file) - ord("a")
+        if turn == "b":
+            pawn, skipped, mover, capturer = f + 24, f + 16, Piece("P"), Piece("p")
+        else:
+            pawn, skipped, mover, capturer = f + 32, f + 40, Piece("p"), Piece("P")
+        if board[pawn] != mover or board[skipped]:
+            return False
+        return ((f > 0 and board[pawn - 1] == capturer) or
+                (f < 7 and board[pawn + 1] == capturer))
+
+    def thaw(self):
+        """Gets a mutable copy of the snapshot.
+
+        :return:
+            A new `Position`.
+        """
+        return Position.from_frozen(self)
+
+    @property
+    def board(self):
+        """A tuple of 64 pieces or `None` indexed by `Square.index`."""
+        return self.__board
+
+    @property
+    def turn(self):
+        """The side to move as `"w"` or `"b"`."""
+        return self.__turn
+
+    @property
+    def castling(self):
+        """The castling rights, like `"KQkq"`, or an empty string."""
+        return self.__castling
+
+    @property
+    def ep_file(self):
+        """The en-passant file as a lowercase letter between `"a"` and
+        `"h"` or `None`."""
+        return self.__ep_file
+
+    @property
+    def half_moves(self):
+        """The number of half-moves since the last capture or pawn move."""
+        return self.__half_moves
+
+    @property
+    def ply(self):
+        """The number of this move."""
+        return self.__ply
+
+    @property
+    def fen(self):
+        """The FEN string representing the position."""
+        return self.thaw().fen
+
+    def get_zobrist_hash(self):
+        """Gets the Polyglot Zobrist hash of the position.
+
+        :return:
+            The hash as a 64 bit integer.
+        """
+        return self.__zobrist
+
+    def __getitem__(self, key):
+        if type(key) is types.IntType:
+            return self.__board[Square.from_x88(key).index]
+        elif isinstance(key, basestring):
+            return self.__board[Square(key).index]
+        elif type(key) is Square:
+            return self.__board[key.index]
+        else:
+            raise TypeError(
+                "Expected integer or Square, got: %s." % repr(key))
 
     def __str__(self):
         return self.fen
 
     def __repr__(self):
-        return "Position.from_fen(%s)" % repr(self.fen)
+        return "FrozenPosition(%s)" % repr(self.fen)
 
     def __eq__(self, other):
-        return self.fen == other.fen
+        if isinstance(other, FrozenPosition):
+            # Different hashes can never belong to equal positions.
+            return self is other or (
+                self.__zobrist == other.__zobrist and
+                self.__board == other.__board and
+                self.__turn == other.__turn and
+                self.__castling == other.__castling and
+                self.__ep_file == other.__ep_file and
+                self.__half_moves == other.__half_moves and
+                self.__ply == other.__ply)
+        elif isinstance(other, Position):
+            return (self.__zobrist == other.get_zobrist_hash() and
+                    other == self.thaw())
+        else:
+            return False
 
     def __ne__(self, other):
-        return self.fen != other.fen
+        return not self.__eq__(other)
 
     def __hash__(self):
-        hasher = ZobristHasher(ZobristHasher.POLYGLOT_RANDOM_ARRAY)
-        return hasher.hash_position(self)
+        return hash(self.__zobrist)
+
+    def __reduce__(self):
+        return (FrozenPosition, (self.__board, self.__turn, self.__castling,
+                                 self.__ep_file, self.__half_moves,
+                                 self.__ply, self.__zobrist))
+
+
+class LegalMoveCache(object):
+    """A bounded cache of legal moves, keyed by the Zobrist hash of the
+    position. The least recently used entries are evicted first.
+
+    Positions use a cache once it is assigned to
+    `Position.legal_move_cache`. One cache can be shared by any number
+    of positions, because the moves of a position only depend on what
+    the hash covers.
+
+    :param maxsize:
+        Defaults to `1024`. The maximum number of positions to
+        remember.
+
+    >>> import chess
+    >>> cache = chess.LegalMoveCache()
+    >>> pos = chess.Position()
+    >>> pos.legal_move_cache = cache
+    >>> len(list(pos.get_legal_moves())), len(list(pos.get_legal_moves()))
+    (20, 20)
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError("Cache size must be >= 1.")
+
+        self.__maxsize = maxsize
+        self.__entries = collections.OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def maxsize(self):
+        """The maximum number of positions to remember."""
+        return self.__maxsize
+
+    @property
+    def hits(self):
+        """The number of successful lookups."""
+        return self.__hits
+
+    @property
+    def misses(self):
+        """The number of lookups of positions not in the cache."""
+        return self.__misses
+
+    def get(self, key, default=None):
+        """Looks up the legal moves of a position.
+
+        :param key:
+            The Zobrist hash of the position.
+        :param default:
+            Defaults to `None`. Returned if the position is not in the
+            cache.
+
+        :return:
+            A tuple of moves or the default.
+        """
+        try:
+            moves = self.__entries.pop(key)
+        except KeyError:
+            self.__misses += 1
+            return default
+
+        # Mark as most recently used.
+        self.__entries[key] = moves
+        self.__hits += 1
+        return moves
+
+    def clear(self):
+        """Removes all entries and resets the counters."""
+        self.__entries.clear()
+        self.__hits = 0
+        self.__misses = 0
+
+    def __setitem__(self, key, moves):
+        self.__entries.pop(key, None)
+        self.__entries[key] = tuple(moves)
+        if len(self.__entries) > self.__maxsize:
+            self.__entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __repr__(self):
+        return "LegalMoveCache(maxsize=%d)" % self.__maxsize
+
+
+def read_fens(lines):
+    """Decodes positions from FENs, one per line.
+
+    :param lines:
+        A file or any other iterable of strings. Empty lines and lines
+        starting with `#` are skipped.
+
+    :yield:
+        A position for every FEN. Lines are only read as positions are
+        requested.
+
+    :raise FenError:
+        If a line is not a valid FEN.
+    """
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield Position(line)
+
+
+def read_epds(lines):
+    """Decodes positions and their operations from EPDs, one per line.
+    See `Position.set_epd()`.
+
+    :param lines:
+        A file or any other iterable of strings. Empty lines and lines
+        starting with `#` are skipped.
+
+    :yield:
+        Tuples of a position and a dictionary of EPD operations.
+
+    :raise FenError:
+        If a line is not a valid EPD.
+    """
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield Position.from_epd(line)
+
+
+def write_fens(handle, positions):
+    """Encodes positions as FENs, one per line.
+
+    :param handle:
+        A file or any other object with a `write()` method.
+    :param positions:
+        An iterable of positions. It is consumed as the lines are
+        written.
+
+    :return:
+        The number of positions written.
+    """
+    count = 0
+    for position in positions:
+        handle.write(position.fen + "\n")
+        count += 1
+    return count
+
+
+def write_epds(handle, entries):
+    """Encodes positions and their operations as EPDs, one per line.
+    See `Position.get_epd()`.
+
+    :param handle:
+        A file or any other object with a `write()` method.
+    :param entries:
+        An iterable of positions or tuples of a position and a
+        dictionary of EPD operations.
+
+    :return:
+        The number of positions written.
+    """
+    count = 0
+    for entry in entries:
+        if isinstance(entry, Position):
+            handle.write(entry.get_epd() + "\n")
+        else:
+            position, operations = entry
+            handle.write(position.get_epd(operations) + "\n")
+        count += 1
+    return count
+
+
+def pack_positions(positions):
+    """Encodes many positions with `Position.pack()`.
+
+    :param positions:
+        An iterable of positions.
+
+    :return:
+        A `bytearray` with `PACKED_SIZE` bytes for each position.
+    """
+    positions = list(positions)
+    buffer = bytearray(PACKED_SIZE * len(positions))
+    for i, position in enumerate(positions):
+        position.pack_into(buffer, PACKED_SIZE * i)
+    return buffer
+
+
+def unpack_positions(data):
+    """Decodes many positions encoded with `Position.pack()`.
+
+    :param data:
+        A string, `bytearray`, `memoryview` or other buffer holding
+        `PACKED_SIZE` bytes for each position.
+
+    :yield:
+        The positions, as they are decoded.
+
+    :raise ValueError:
+        If the data is not a valid encoding.
+    """
+    if len(data) % PACKED_SIZE:
+        raise ValueError(
+            "Expected a multiple of %d bytes to unpack." % PACKED_SIZE)
+    for offset in xrange(0, len(data), PACKED_SIZE):
+        yield Position.unpack(data, offset)
+
+
+def positions_to_planes(positions, planes=None, features=None):
+    """Writes a batch of positions to NumPy arrays, for example to feed
+    them to an evaluation model. Requires NumPy.
+
+    Each position becomes 12 planes of 8x8 squares, one per piece in
+    the order `"pPnNbBrRqQkK"` also used by `ZobristHasher`. Rows and
+    columns follow the x88 board, so row 0 is the eighth rank and
+    column 0 is the a-file.
+
+    :param positions:
+        A sequence of positions.
+    :param planes:
+        Optional. A preallocated `uint8` array of shape `(N, 12, 8, 8)`
+        to write the planes to.
+    :param features:
+        Optional. A preallocated `uint8` array of shape `(N, 6)` to
+        write further features to: 1 if white is to move, the castling
+        rights `K`, `Q`, `k` and `q` as 0 or 1 and the en-passant file
+        as 1 to 8 or 0 for none.
+
+    :return:
+        A tuple of the planes and the features.
+    """
+    if numpy is None:
+        raise ImportError("positions_to_planes() requires NumPy.")
+
+    positions = list(positions)
+    if planes is None:
+        planes = numpy.zeros((len(positions), 12, 8, 8), dtype=numpy.uint8)
+    if features is None:
+        features = numpy.zeros((len(positions), 6), dtype=numpy.uint8)
+
+    bitboards = numpy.array(
+        [[position.get_bitboard(piece) for piece in _PLANE_PIECES]
+         for position in positions],
+        dtype=numpy.uint64).reshape(len(positions), 12)
+
+    # Unpack the bitboards to one byte per square and flip the ranks.
+    bits = (bitboards[:, :, numpy.newaxis] >> _PLANE_SHIFTS) & numpy.uint64(1)
+    planes[...] = bits.astype(numpy.uint8).reshape(-1, 12, 8, 8)[:, :, ::-1, :]
+
+    for i, position in enumerate(positions):
+        ep_file = position.ep_file
+        if ep_file and position.get_theoretical_ep_right(ep_file):
+            ep_file = ord(ep_file) - ord("a") + 1
+        else:
+            ep_file = 0
+        features[i] = (
+            position.turn == "w",
+            position.get_castling_right("K"),
+            position.get_castling_right("Q"),
+            position.get_castling_right("k"),
+            position.get_castling_right("q"),
+            ep_file)
+
+    return planes, features
+
+
+def planes_to_positions(planes, features=None):
+    """Decodes positions from arrays written by
+    `positions_to_planes()`. Requires NumPy.
+
+    The arrays are converted to packed positions all at once and then
+    decoded with `Position.unpack()`. Move counters are not part of
+    the arrays and are reset.
+
+    :param planes:
+        An array of shape `(N, 12, 8, 8)`.
+    :param features:
+        Optional. An array of shape `(N, 6)`. Defaults to white to
+        move, no castling rights and no en-passant file.
+
+    :return:
+        A list of positions.
+
+    :raise ValueError:
+        If a square is occupied twice or a position has more than 32
+        pieces.
+    """
+    if numpy is None:
+        raise ImportError("planes_to_positions() requires NumPy.")
+
+    planes = numpy.asarray(planes)
+    count = planes.shape[0]
+    if features is None:
+        features = numpy.zeros((count, 6), dtype=numpy.uint8)
+        features[:, 0] = 1
+    features = numpy.asarray(features).astype(numpy.uint8)
+
+    # Back to the order of `Square.index`.
+    squares = planes[:, :, ::-1, :].reshape(count, 12, 64) != 0
+    occupied = squares.any(axis=1)
+    if (squares.sum(axis=1) > 1).any():
+        raise ValueError("A square is occupied by more than one piece.")
+    counts = occupied.sum(axis=1)
+    if (counts > 32).any():
+        raise ValueError("Can not decode more than 32 pieces.")
+
+    # Piece codes of occupied squares in the order of the squares,
+    # padded to 32 pieces, two per byte.
+    codes = _PLANE_TO_PACKED_CODES[squares.argmax(axis=1)]
+    order = numpy.argsort(~occupied, axis=1, kind="mergesort")[:, :32]
+    codes = codes[numpy.arange(count)[:, numpy.newaxis], order]
+    codes[numpy.arange(32) >= counts[:, numpy.newaxis]] = 0
+
+    records = numpy.zeros(count, dtype=_PACKED_DTYPE)
+    records["occupied"] = numpy.bitwise_or.reduce(
+        occupied.astype(numpy.uint64) << _PLANE_SHIFTS, axis=1)
+    records["pieces"] = codes[:, 0::2] | codes[:, 1::2] << 4
+    records["flags"] = ((features[:, 0] == 0) | features[:, 1] << 1 |
+                        features[:, 2] << 2 | features[:, 3] << 3 |
+                        features[:, 4] << 4)
+    records["ep_file"] = features[:, 5]
+    records["ply"] = 1
+
+    return list(unpack_positions(records.tostring()))
+
 
 class ZobristHasher(object):
     """Represents a zobrist-hash function.
@@ -1772,12 +3713,10 @@ class ZobristHasher(object):
         key = 0
 
         # Hash in the board setup.
-        for x in range(0, 8):
-            for y in range(0, 8):
-                piece = position[Square.from_x_and_y(x, y)]
-                if piece:
-                    i = "pPnNbBrRqQkK".index(piece.symbol)
-                    key ^= self.__random_array[64 * i + 8 * y + x]
+        for index in scan_forward(position.get_bitboard()):
+            piece = position[SQUARES[index]]
+            i = "pPnNbBrRqQkK".index(piece.symbol)
+            key ^= self.__random_array[64 * i + index]
 
         # Hash in the castling flags.
         if position.get_castling_right("K"):
@@ -1811,6 +3750,56 @@ class ZobristHasher(object):
         return cls(tuple(random.randint(0, 2**64) for i in range(0, 781)))
 
 
+# Parts of the Polyglot random array, arranged for incremental updates
+# of the Zobrist key of a position.
+_ZOBRIST_PIECE_KEYS = dict(
+    (symbol, tuple(ZobristHasher.POLYGLOT_RANDOM_ARRAY[64 * i + index]
+                   for index in range(64)))
+    for i, symbol in enumerate("pPnNbBrRqQkK"))
+
+_ZOBRIST_CASTLING_KEYS = {"": 0}
+for _i, _type in enumerate("KQkq"):
+    for _castling, _key in _ZOBRIST_CASTLING_KEYS.items():
+        _ZOBRIST_CASTLING_KEYS[_castling + _type] = (
+            _key ^ ZobristHasher.POLYGLOT_RANDOM_ARRAY[768 + _i])
+del _i, _type, _castling, _key
+
+_ZOBRIST_EP_KEYS = dict(
+    (file, ZobristHasher.POLYGLOT_RANDOM_ARRAY[772 + i])
+    for i, file in enumerate("abcdefgh"))
+
+_ZOBRIST_TURN_KEY = ZobristHasher.POLYGLOT_RANDOM_ARRAY[780]
+
+
+# Occupancy, two words of piece codes, flags, en-passant file, half-move
+# counter and ply, as used by `Position.pack()`.
+_PACKED_FORMAT = "<QQQBBHI"
+
+_PACKED_PIECES = [Piece(symbol) for symbol in "PNBRQKpnbrqk"]
+
+_PACKED_PIECE_CODES = dict(
+    (piece.symbol, code) for code, piece in enumerate(_PACKED_PIECES))
+
+
+# Piece order of the planes used by `positions_to_planes()`.
+_PLANE_PIECES = [Piece(symbol) for symbol in "pPnNbBrRqQkK"]
+
+if numpy is not None:
+    _PLANE_SHIFTS = numpy.arange(64, dtype=numpy.uint64)
+
+    _PLANE_TO_PACKED_CODES = numpy.array(
+        [_PACKED_PIECE_CODES[piece.symbol] for piece in _PLANE_PIECES],
+        dtype=numpy.uint8)
+
+    _PACKED_DTYPE = numpy.dtype([
+        ("occupied", "<u8"),
+        ("pieces", "u1", 16),
+        ("flags", "u1"),
+        ("ep_file", "u1"),
+        ("half_moves", "<u2"),
+        ("ply", "<u4")])
+
+
 class GameHeaderBag(collections.MutableMapping):
     """A glorified dictionary of game headers as used in PGNs.
 
@@ -2157,6 +4146,9 @@ class EcoFileParser(object):
 
         self.chunks = collections.deque()
 
+        # Openings share their first moves, so parsed moves are cached.
+        self.san_cache = dict()
+
     def tokenize(self, filename):
         handle = open(filename, "r")
         for line in handle:
@@ -2202,7 +4194,9 @@ class EcoFileParser(object):
                 if self.classification is not None or not self.current_eco in self.lookup:
                     match = EcoFileParser.__move_regex.match(chunk)
                     if match.group(2):
-                        self.current_position.make_move(self.current_position.get_move_from_san(match.group(2)))
+                        move = self.current_position.get_move_from_san(
+                            match.group(2), self.san_cache)
+                        self.current_position.make_move(move, False)
 
     def read_all(self):
         while self.chunks:
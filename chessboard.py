@@ -50,6 +50,7 @@ class Board(QWidget):
         self.dragPosition = None
 
         self.position = chess.Position()
+        self.position.legal_move_cache = chess.LegalMoveCache(64)
         self.position.make_move(chess.Move.from_uci("e2e4"))
 
         # Load piece set.
@@ -199,17 +200,18 @@ class Board(QWidget):
             return None
 
     def canDragSquare(self, square):
-        for move in self.position.get_legal_moves():
-            if move.source == square:
-                return True
+        if square is None:
+            return False
+        for move in self.position.get_legal_moves_from(square):
+            return True
         return False
 
     def onSquareClicked(self, square):
         pass
 
     def moveFromDragDrop(self, source, target):
-        for move in self.position.get_legal_moves():
-            if move.source == source and move.target == target:
+        for move in self.position.get_legal_moves_from(source):
+            if move.target == target:
                 if move.promotion:
                     dialog = PromotionDialog(self.position[move.source].color, self)
                     if dialog.exec_():
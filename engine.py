@@ -0,0 +1,547 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""A small alpha-beta searcher on top of `chess.Position`.
+
+>>> import chess, engine
+>>> searcher = engine.Searcher()
+>>> result = searcher.search(chess.Position("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"), depth=3)
+>>> result.move
+Move.from_uci('a1a8')
+>>> result.score == engine.MATE_SCORE - 1
+True
+"""
+
+import chess
+import collections
+import optparse
+import sys
+import textwrap
+import time
+
+
+MATE_SCORE = 100000
+"""The score of giving mate right now. Mate in n plies scores
+`MATE_SCORE - n`, getting mated in n plies `-MATE_SCORE + n`."""
+
+MAX_PLY = 64
+"""The maximum search depth, including the quiescence search."""
+
+INFINITY = 1000000
+
+PIECE_VALUES = {
+    "p": 100,
+    "n": 320,
+    "b": 330,
+    "r": 500,
+    "q": 900,
+    "k": 0,
+}
+"""The material value of each piece type in centipawns."""
+
+# Piece-square bonuses in centipawns from the point of view of white,
+# written as seen from the white side of the board: The first row is
+# the eighth rank.
+PIECE_SQUARE_TABLES = {
+    "p": (
+          0,   0,   0,   0,   0,   0,   0,   0,
+         50,  50,  50,  50,  50,  50,  50,  50,
+         10,  10,  20,  30,  30,  20,  10,  10,
+          5,   5,  10,  25,  25,  10,   5,   5,
+          0,   0,   0,  20,  20,   0,   0,   0,
+          5,  -5, -10,   0,   0, -10,  -5,   5,
+          5,  10,  10, -20, -20,  10,  10,   5,
+          0,   0,   0,   0,   0,   0,   0,   0),
+    "n": (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20,   0,   0,   0,   0, -20, -40,
+        -30,   0,  10,  15,  15,  10,   0, -30,
+        -30,   5,  15,  20,  20,  15,   5, -30,
+        -30,   0,  15,  20,  20,  15,   0, -30,
+        -30,   5,  10,  15,  15,  10,   5, -30,
+        -40, -20,   0,   5,   5,   0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50),
+    "b": (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,  10,  10,   5,   0, -10,
+        -10,   5,   5,  10,  10,   5,   5, -10,
+        -10,   0,  10,  10,  10,  10,   0, -10,
+        -10,  10,  10,  10,  10,  10,  10, -10,
+        -10,   5,   0,   0,   0,   0,   5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20),
+    "r": (
+          0,   0,   0,   0,   0,   0,   0,   0,
+          5,  10,  10,  10,  10,  10,  10,   5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+          0,   0,   0,   5,   5,   0,   0,   0),
+    "q": (
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,   5,   5,   5,   0, -10,
+         -5,   0,   5,   5,   5,   5,   0,  -5,
+          0,   0,   5,   5,   5,   5,   0,  -5,
+        -10,   5,   5,   5,   5,   5,   0, -10,
+        -10,   0,   5,   0,   0,   0,   0, -10,
+        -20, -10, -10,  -5,  -5, -10, -10, -20),
+    "k": (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+         20,  20,   0,   0,   0,   0,  20,  20,
+         20,  30,  10,   0,   0,  10,  30,  20),
+}
+
+
+SearchResult = collections.namedtuple("SearchResult", [
+    "move",
+    "score",
+    "depth",
+    "nodes",
+    "pv",
+    "seconds"])
+
+
+class Searcher(object):
+    """An iterative deepening principal variation searcher.
+
+    The transposition table, keyed by Zobrist hash, is kept between
+    searches.
+
+    :param hash_size:
+        Defaults to `2 ** 18`. The maximum number of transposition table
+        entries. The table is cleared when it is full.
+    """
+
+    # Transposition table bounds.
+    __EXACT = 0
+    __LOWER = 1
+    __UPPER = 2
+
+    def __init__(self, hash_size=2 ** 18):
+        self.__hash_size = hash_size
+        self.__table = dict()
+
+    def clear_hash(self):
+        """Forgets all positions in the transposition table."""
+        self.__table.clear()
+
+    def search(self, position, depth=None, movetime=None, nodes=None,
+               callback=None):
+        """Searches for the best move. At least one limit must be
+        given. The first iteration is always completed.
+
+        :param position:
+            The position to search. It is not changed. Positions
+            before it in its move stack count for repetitions.
+        :param depth:
+            Optional. The maximum depth in plies, at least 1.
+        :param movetime:
+            Optional. The maximum time to search in seconds.
+        :param nodes:
+            Optional. The approximate maximum number of nodes to search.
+        :param callback:
+            Optional. Called with the `SearchResult` of each completed
+            iteration.
+
+        :return:
+            A named tuple with these properties:
+
+            `move`:
+                The best move found or `None` if there are no legal
+                moves.
+            `score`:
+                The score in centipawns from the point of view of the
+                side to move. See `MATE_SCORE` for mate scores.
+            `depth`:
+                The depth of the last completed iteration.
+            `nodes`:
+                The number of nodes searched.
+            `pv`:
+                The principal variation as a list of moves.
+            `seconds`:
+                The time taken.
+
+        :raise ValueError:
+            If no limit is given or the depth is less than 1.
+        """
+        if depth is None and movetime is None and nodes is None:
+            raise ValueError("Expected a depth, time or node limit.")
+        if depth is not None and depth < 1:
+            raise ValueError("Expected a depth of at least 1, got: %d." % depth)
+
+        start = time.time()
+        self.__position = position.copy()
+        self.__position.legal_move_cache = None
+        self.__deadline = start + movetime if movetime is not None else None
+        self.__node_limit = nodes
+        self.__limited = False
+        self.__nodes = 0
+
+        # Game positions since the last capture or pawn move may be
+        # repeated, so they are seeded into the search path.
+        self.__path = []
+        history = position.copy()
+        for ply in xrange(position.half_moves):
+            try:
+                history.unmake_move()
+            except IndexError:
+                break
+            self.__path.append(history.get_zobrist_hash())
+
+        self.__pv = [[] for ply in xrange(MAX_PLY + 2)]
+        self.__killers = [[None, None] for ply in xrange(MAX_PLY + 2)]
+        self.__history = dict()
+
+        if not self.__position.count_legal_moves():
+            score = -MATE_SCORE if self.__position.is_check() else 0
+            return SearchResult(None, score, 0, 0, [], time.time() - start)
+
+        max_depth = MAX_PLY if depth is None else min(depth, MAX_PLY)
+        result = None
+        for iteration in xrange(1, max_depth + 1):
+            try:
+                score = self.__search(iteration, -INFINITY, INFINITY, 0, False)
+            except _SearchAborted:
+                break
+
+            pv = list(self.__pv[0])
+            result = SearchResult(pv[0], score, iteration, self.__nodes, pv,
+                                  time.time() - start)
+            if callback:
+                callback(result)
+
+            # Only later iterations may be aborted.
+            self.__limited = True
+
+            # Stop when a forced mate has been found.
+            if abs(score) >= MATE_SCORE - iteration:
+                break
+
+        return result._replace(nodes=self.__nodes,
+                               seconds=time.time() - start)
+
+    def __search(self, depth, alpha, beta, ply, allow_null):
+        # Negamax with a principal variation search. Returns the score
+        # from the point of view of the side to move.
+        self.__pv[ply] = []
+        if depth <= 0:
+            return self.__quiesce(alpha, beta, ply)
+
+        self.__count_node()
+        position = self.__position
+        key = position.get_zobrist_hash()
+
+        if ply:
+            if position.half_moves >= 100:
+                # Checkmate takes precedence over the fifty-move rule.
+                if position.is_check() and not position.count_legal_moves():
+                    return -MATE_SCORE + ply
+                return 0
+            if key in self.__path:
+                return 0
+            if ply >= MAX_PLY:
+                return evaluate(position)
+
+        in_check = position.is_check()
+        if in_check:
+            depth += 1
+        pv_node = beta - alpha > 1
+
+        # Probe the transposition table.
+        tt_move = None
+        entry = self.__table.get(key)
+        if entry is not None:
+            entry_depth, bound, score, tt_move = entry
+            if entry_depth >= depth and ply and not pv_node:
+                score = _score_from_table(score, ply)
+                if (bound == Searcher.__EXACT or
+                        (bound == Searcher.__LOWER and score >= beta) or
+                        (bound == Searcher.__UPPER and score <= alpha)):
+                    return score
+
+        # Null-move pruning. Pass and see if the opponent can still not
+        # reach beta with a reduced search. Not done without pieces,
+        # where passing might be the best move.
+        if (allow_null and not pv_node and not in_check and depth >= 3 and
+                _has_pieces(position, position.turn) and
+                evaluate(position) >= beta):
+            ep_file = position.ep_file
+            position.ep_file = None
+            position.toggle_turn()
+            self.__path.append(key)
+            score = -self.__search(depth - 3, -beta, -beta + 1, ply + 1, False)
+            self.__path.pop()
+            position.toggle_turn()
+            position.ep_file = ep_file
+            if score >= beta:
+                return beta
+
+        best_score = -INFINITY
+        best_move = None
+        bound = Searcher.__UPPER
+        searched = 0
+
+        self.__path.append(key)
+        for move, is_quiet in self.__get_ordered_moves(ply, tt_move):
+            position.make_move(move, False)
+            if not searched:
+                score = -self.__search(depth - 1, -beta, -alpha, ply + 1, True)
+            else:
+                # Try to prove the move is worse with a null window
+                # first.
+                score = -self.__search(depth - 1, -alpha - 1, -alpha, ply + 1, True)
+                if alpha < score < beta:
+                    score = -self.__search(depth - 1, -beta, -alpha, ply + 1, True)
+            position.unmake_move()
+            searched += 1
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    bound = Searcher.__EXACT
+                    self.__pv[ply] = [move] + self.__pv[ply + 1]
+                    if score >= beta:
+                        bound = Searcher.__LOWER
+                        if is_quiet:
+                            self.__remember_quiet_cutoff(move, depth, ply)
+                        break
+        self.__path.pop()
+
+        if not searched:
+            return -MATE_SCORE + ply if in_check else 0
+
+        if len(self.__table) >= self.__hash_size:
+            self.__table.clear()
+        self.__table[key] = (depth, bound, _score_to_table(best_score, ply),
+                             best_move.to_int())
+
+        return best_score
+
+    def __quiesce(self, alpha, beta, ply):
+        # Only searches captures and promotions until the position is
+        # quiet, so that the evaluation does not miss hanging pieces.
+        # In check, standing pat is not an option and all evasions are
+        # searched.
+        self.__pv[ply] = []
+        self.__count_node()
+        position = self.__position
+
+        if ply >= MAX_PLY:
+            return evaluate(position)
+
+        if position.is_check():
+            moves = list(position.get_legal_evasions())
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -INFINITY
+        else:
+            best_score = evaluate(position)
+            if best_score >= beta:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+            moves = position.get_legal_captures()
+
+        captures = [(_mvv_lva(position, move), move) for move in moves]
+        captures.sort(key=lambda entry: entry[0], reverse=True)
+
+        for order, move in captures:
+            position.make_move(move, False)
+            score = -self.__quiesce(-beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    if score >= beta:
+                        return score
+                    alpha = score
+                    self.__pv[ply] = [move] + self.__pv[ply + 1]
+
+        return best_score
+
+    def __get_ordered_moves(self, ply, tt_move):
+        # Yields the move from the transposition table, then captures
+        # by most valuable victim and least valuable attacker, then
+        # killer moves and quiet moves by history. Quiet moves are only
+        # generated if needed.
+        position = self.__position
+
+        if tt_move is not None:
+            move = chess.Move.from_int(tt_move)
+            if position.is_legal(move):
+                yield move, _is_quiet(position, move)
+
+        captures = [(_mvv_lva(position, move), move)
+                    for move in position.get_legal_captures()
+                    if move.to_int() != tt_move]
+        captures.sort(key=lambda entry: entry[0], reverse=True)
+        for order, move in captures:
+            yield move, False
+
+        killers = self.__killers[ply]
+        history = self.__history
+        turn = position.turn
+        quiet_moves = []
+        for move in position.get_legal_quiet_moves():
+            move_int = move.to_int()
+            if move_int == tt_move:
+                continue
+            elif move_int == killers[0]:
+                order = INFINITY
+            elif move_int == killers[1]:
+                order = INFINITY - 1
+            else:
+                order = history.get((turn, move_int), 0)
+            quiet_moves.append((order, move))
+        quiet_moves.sort(key=lambda entry: entry[0], reverse=True)
+        for order, move in quiet_moves:
+            yield move, True
+
+    def __remember_quiet_cutoff(self, move, depth, ply):
+        move_int = move.to_int()
+        killers = self.__killers[ply]
+        if killers[0] != move_int:
+            killers[1] = killers[0]
+            killers[0] = move_int
+
+        key = (self.__position.turn, move_int)
+        self.__history[key] = self.__history.get(key, 0) + depth * depth
+
+    def __count_node(self):
+        self.__nodes += 1
+        if self.__limited and not self.__nodes & 1023:
+            if self.__node_limit is not None and self.__nodes >= self.__node_limit:
+                raise _SearchAborted()
+            if self.__deadline is not None and time.time() >= self.__deadline:
+                raise _SearchAborted()
+
+
+class _SearchAborted(Exception):
+    pass
+
+
+def evaluate(position):
+    """Evaluates material and piece placement.
+
+    :param position:
+        The position to evaluate.
+
+    :return:
+        The score in centipawns from the point of view of the side to
+        move.
+    """
+    score = 0
+    for piece, table in _EVAL_TABLES:
+        for index in chess.scan_forward(position.get_bitboard(piece)):
+            score += table[index]
+    return score if position.turn == "w" else -score
+
+
+def _has_pieces(position, color):
+    for type in "nbrq":
+        if position.get_bitboard(chess.Piece.from_color_and_type(color, type)):
+            return True
+    return False
+
+
+def _is_quiet(position, move):
+    piece = position[move.source]
+    if position[move.target] or move.promotion:
+        return False
+    return not (piece.type == "p" and move.source.file != move.target.file)
+
+
+def _mvv_lva(position, move):
+    attacker = position[move.source]
+    victim = position[move.target]
+    if victim:
+        value = PIECE_VALUES[victim.type]
+    elif attacker.type == "p" and move.source.file != move.target.file:
+        value = PIECE_VALUES["p"]
+    else:
+        value = 0
+    if move.promotion:
+        value += PIECE_VALUES[move.promotion]
+    return 10 * value - PIECE_VALUES[attacker.type]
+
+
+def _score_to_table(score, ply):
+    # Mate scores are stored relative to the position, not the root.
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    elif score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    elif score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+def _eval_tables():
+    # Material and piece-square bonus for each piece on each square,
+    # indexed by `Square.index`. Black scores negative.
+    tables = []
+    for symbol in "PNBRQKpnbrqk":
+        piece = chess.Piece(symbol)
+        value = PIECE_VALUES[piece.type]
+        bonuses = PIECE_SQUARE_TABLES[piece.type]
+        if piece.color == "w":
+            table = tuple(value + bonuses[index ^ 56] for index in xrange(64))
+        else:
+            table = tuple(-value - bonuses[index] for index in xrange(64))
+        tables.append((piece, table))
+    return tables
+
+_EVAL_TABLES = _eval_tables()
+
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    usage = "usage: %prog [OPTIONS] [FEN]"
+    description = """\
+                  This script searches a position for the best move and
+                  prints the principal variation of each iteration.
+                  Defaults to the start position.
+                  """
+    parser = optparse.OptionParser(usage, description=textwrap.dedent(description))
+    parser.add_option("-d", "--depth", dest="depth", type="int", default=None,
+        help="the maximum depth to search")
+    parser.add_option("-t", "--movetime", dest="movetime", type="float", default=None,
+        help="the maximum time to search in seconds")
+    parser.add_option("-n", "--nodes", dest="nodes", type="int", default=None,
+        help="the maximum number of nodes to search")
+
+    options, args = parser.parse_args()
+
+    if len(args) > 1:
+        parser.error("expected at most one FEN, quoted")
+
+    position = chess.Position(args[0] if args else chess.START_FEN)
+    if options.depth is None and options.movetime is None and options.nodes is None:
+        options.movetime = 5.0
+
+    def print_result(result):
+        print "depth %d score %d nodes %d time %.3f pv %s" % (
+            result.depth, result.score, result.nodes, result.seconds,
+            " ".join(move.uci for move in result.pv))
+
+    result = Searcher().search(position, options.depth, options.movetime,
+                               options.nodes, print_result)
+    print "bestmove %s" % (result.move.uci if result.move else "(none)")
+    sys.exit(0)
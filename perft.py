@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import chess
+import optparse
+import textwrap
+import time
+import json
+
+if __name__ == "__main__":
+    # Parse command line arguments.
+    usage = "usage: %prog [OPTIONS] [SUITE FILE]"
+    description = """\
+                  This script runs perft over a suite of positions and
+                  compares the node counts with the expected ones. Each
+                  line of the suite file is a FEN followed by expected
+                  node counts like ;D1 20 ;D2 400.
+                  Defaults to resources/perftsuite.epd.
+                  """
+    parser = optparse.OptionParser(usage, description=textwrap.dedent(description))
+    parser.add_option("-d", "--depth", dest="depth", type="int", default=3,
+        help="the maximum depth to search (default: 3)")
+    parser.add_option("--hash", action="store_true", default=False,
+        help="remember node counts of transpositions by Zobrist hash")
+    parser.add_option("--divide", action="store_true", default=False,
+        help="print the node counts of each move at the maximum depth")
+    parser.add_option("--json", action="store_true", default=False,
+        help="write the results and timings as JSON")
+
+    options, args = parser.parse_args()
+
+    if len(args) > 1:
+        parser.error("expected at most one suite file")
+
+    filename = args[0] if args else "resources/perftsuite.epd"
+
+    # Run the suite.
+    results = []
+    failures = 0
+    for line in open(filename, "r"):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        parts = line.split(";")
+        position = chess.Position(parts[0].strip())
+
+        for part in parts[1:]:
+            depth, expected = part.split()
+            depth, expected = int(depth[1:]), int(expected)
+            if depth > options.depth:
+                continue
+
+            hash_table = dict() if options.hash else None
+            start = time.time()
+            if options.divide and depth == options.depth:
+                counts = position.divide(depth, hash_table)
+                nodes = sum(counts.values())
+            else:
+                counts = None
+                nodes = position.perft(depth, hash_table)
+            seconds = time.time() - start
+
+            if nodes != expected:
+                failures += 1
+
+            results.append({
+                "fen": position.fen,
+                "depth": depth,
+                "nodes": nodes,
+                "expected": expected,
+                "seconds": seconds,
+                "nps": int(nodes / seconds) if seconds else None,
+            })
+
+            if not options.json:
+                print "%s %s D%d: %d nodes in %.3f s (%s nps)%s" % (
+                    "ok  " if nodes == expected else "FAIL",
+                    position.fen, depth, nodes, seconds,
+                    results[-1]["nps"],
+                    "" if nodes == expected else ", expected %d" % expected)
+                if counts:
+                    for move in sorted(counts, key=lambda move: move.uci):
+                        print "    %s %d" % (move.uci, counts[move])
+
+    # Write the summary.
+    total_nodes = sum(result["nodes"] for result in results)
+    total_seconds = sum(result["seconds"] for result in results)
+    if options.json:
+        json.dump({
+            "results": results,
+            "failures": failures,
+            "nodes": total_nodes,
+            "seconds": total_seconds,
+            "nps": int(total_nodes / total_seconds) if total_seconds else None,
+        }, sys.stdout, indent=2, separators=(",", ": "))
+        print
+    else:
+        print "%d nodes in %.3f s, %d failures." % (
+            total_nodes, total_seconds, failures)
+
+    sys.exit(1 if failures else 0)
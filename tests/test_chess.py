@@ -1,6 +1,8 @@
 import unittest
 import chess
 import random
+import StringIO
+import pickle
 
 
 class GameHeaderBagTestCase(unittest.TestCase):
@@ -82,6 +84,16 @@ class MoveTestCase(unittest.TestCase):
         self.assertEqual(chess.Move.from_uci('b5c7').uci, 'b5c7')
         self.assertEqual(chess.Move.from_uci('e7e8q').uci, 'e7e8q')
 
+    def test_int_encoding(self):
+        """Tests the integer encoding of moves."""
+        for uci in ["e2e4", "e7e8q", "a2a1n", "h8a1", "b7c8r", "0000"]:
+            move = chess.Move.from_uci(uci)
+            self.assertTrue(0 <= move.to_int() < 2 ** 16)
+            self.assertEqual(chess.Move.from_int(move.to_int()), move)
+            self.assertEqual(hash(move), move.to_int())
+        self.assertEqual(chess.Move.from_uci("e2e4").to_int(), 12 | 28 << 6)
+        self.assertRaises(ValueError, chess.Move.from_int, 5 << 12)
+
 
 class PieceTestCase(unittest.TestCase):
     """Tests the Piece class."""
@@ -127,6 +139,38 @@ class PositionTestCase(unittest.TestCase):
         self.assertEqual(pos.fen, "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
         self.assertEqual(pos.turn, "w")
 
+    def test_equality(self):
+        """Tests comparing positions and the cached FEN."""
+        a = chess.Position()
+        b = chess.Position()
+        self.assertEqual(a, b)
+        self.assertFalse(a != b)
+        self.assertNotEqual(a, chess.START_FEN)
+
+        b.make_move(chess.Move.from_uci("e2e4"))
+        self.assertNotEqual(a, b)
+        self.assertEqual(b.fen, "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+        b.unmake_move()
+        self.assertEqual(a, b)
+        self.assertEqual(b.fen, chess.START_FEN)
+
+        b.half_moves = 3
+        self.assertNotEqual(a, b)
+        self.assertEqual(b.fen, "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 3 1")
+        b.ply = 2
+        self.assertEqual(b.fen, "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 3 2")
+        b.half_moves = 0
+        b.ply = 1
+        del b["a8"]
+        self.assertNotEqual(a, b)
+        self.assertEqual(b.fen, "1nbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+
+        # Impossible en-passant files do not matter.
+        self.assertEqual(
+            chess.Position("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"),
+            chess.Position("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"))
+        self.assertEqual(eval(repr(a), {"Position": chess.Position}), a)
+
     def test_scholars_mate(self):
         """Tests the scholars mate."""
         pos = chess.Position()
@@ -179,6 +223,42 @@ class PositionTestCase(unittest.TestCase):
 
         self.assertEqual(pos.fen, "1rbqkbnr/pppp1Qpp/2n5/4p3/2B1P3/8/PPPP1PPP/RNB1K1NR b KQk - 0 4")
 
+    def test_status_counters(self):
+        """Tests that changing the move counters updates the cached
+        status."""
+        pos = chess.Position("4k3/8/8/8/8/8/8/4KR2 w - - 99 60")
+        self.assertFalse(pos.status().is_fifty_moves)
+        pos.half_moves = 100
+        self.assertTrue(pos.status().is_fifty_moves)
+        pos.ply = 61
+        self.assertTrue(pos.status().is_fifty_moves)
+        pos.half_moves = 0
+        self.assertFalse(pos.status().is_fifty_moves)
+
+    def test_status(self):
+        """Tests evaluating the game status."""
+        status = chess.Position().status()
+        self.assertFalse(status.is_check)
+        self.assertFalse(status.is_game_over)
+        self.assertFalse(status.is_fifty_moves)
+
+        status = chess.Position("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1").status()
+        self.assertTrue(status.is_stalemate)
+        self.assertFalse(status.is_checkmate)
+        self.assertTrue(status.is_game_over)
+
+        pos = chess.Position("8/8/8/8/8/2k5/8/K1b2b2 w - - 120 80")
+        self.assertTrue(pos.status().is_fifty_moves)
+        self.assertFalse(pos.is_insufficient_material())
+        pos = chess.Position("8/8/8/8/2B5/2k5/8/K1b2b2 w - - 0 80")
+        self.assertFalse(pos.is_insufficient_material())
+        pos = chess.Position("8/8/8/8/3B4/2k5/8/K1b1b3 w - - 0 80")
+        self.assertTrue(pos.is_insufficient_material())
+        self.assertTrue(pos.is_game_over())
+        self.assertFalse(pos.is_stalemate())
+        self.assertTrue(chess.Position("8/8/8/8/8/2k5/8/K1n5 w - - 0 1").is_insufficient_material())
+        self.assertFalse(chess.Position("8/8/8/8/8/2k5/8/K1p5 w - - 0 1").is_insufficient_material())
+
     def test_move_info(self):
         """Tests move info generation."""
         pos = chess.Position()
@@ -188,6 +268,70 @@ class PositionTestCase(unittest.TestCase):
         self.assertFalse(e4.is_checkmate)
         self.assertFalse(e4.is_castle)
 
+    def test_move_info_keeps_status(self):
+        """Tests that getting move infos does not leak facts about the
+        position after the move."""
+        pos = chess.Position("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        self.assertTrue(pos.get_move_info(chess.Move.from_uci("a1a8")).is_checkmate)
+        self.assertFalse(pos.is_check())
+        self.assertFalse(pos.is_checkmate())
+        self.assertFalse(pos.is_game_over())
+
+        pos = chess.Position("4k3/8/8/8/8/8/8/R3K3 w - - 0 1")
+        pos.status()
+        self.assertTrue(pos.get_move_info(chess.Move.from_uci("a1a8")).is_check)
+        self.assertFalse(pos.status().is_check)
+        self.assertFalse(pos.is_king_attacked("b"))
+
+        # Copy-on-write copies stay shared, since the position is only
+        # read.
+        pos = chess.Position("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        copy = pos.copy(copy_on_write=True)
+        board = pos._Position__board
+        pos.get_all_move_infos()
+        self.assertTrue(pos._Position__board is board)
+        self.assertTrue(copy._Position__board is board)
+
+    def test_all_move_infos(self):
+        """Tests getting information about all legal moves at once."""
+        for fen in [chess.START_FEN,
+                    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                    "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"]:
+            pos = chess.Position(fen)
+            infos = pos.get_all_move_infos()
+            self.assertEqual([info.move for info in infos], list(pos.get_legal_moves()))
+            for info in infos:
+                self.assertEqual(info, pos.get_move_info(info.move))
+            self.assertEqual(pos.fen, fen)
+
+        pos = chess.Position("r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4")
+        sans = set(info.san for info in pos.get_all_move_infos())
+        self.assertTrue("Qxf7#" in sans)
+        self.assertTrue("Bxf7+" in sans)
+
+        # Disambiguation by file, by rank and by both.
+        pos = chess.Position("4k3/8/8/8/8/8/4N3/1N2K3 w - - 0 1")
+        sans = set(info.san for info in pos.get_all_move_infos())
+        self.assertTrue("Nbc3" in sans)
+        self.assertTrue("Nec3" in sans)
+        self.assertTrue("Nd4" in sans)
+        pos = chess.Position("5k2/8/8/8/Q6Q/8/8/Q3K3 w - - 0 1")
+        sans = set(info.san for info in pos.get_all_move_infos())
+        self.assertTrue("Qa4d4" in sans)
+        self.assertTrue("Qhd4" in sans)
+        self.assertTrue("Q1d4" in sans)
+        self.assertTrue("Q4a3+" in sans)
+        self.assertTrue("Qb2" in sans)
+
+        # Pawn captures are always qualified by the file only.
+        pos = chess.Position("4k3/8/8/1p6/P1P5/8/8/4K3 w - - 0 1")
+        infos = dict((info.move.uci, info.san) for info in pos.get_all_move_infos())
+        self.assertEqual(infos["a4b5"], "axb5")
+        self.assertEqual(infos["c4b5"], "cxb5")
+        for uci in ["a4b5", "c4b5"]:
+            self.assertEqual(pos.get_move_from_san(infos[uci]), chess.Move.from_uci(uci))
+
     def test_pawn_captures(self):
         """Tests pawn captures in the kings gambit."""
         pos = chess.Position()
@@ -220,6 +364,170 @@ Kasparov vs. Deep Blue game."""
         pos = chess.Position("8/2R1P3/8/2pp4/2k1r3/P7/8/1K6 w - - 1 55")
         list(pos.get_pseudo_legal_moves())
 
+    def test_legal_move_generation(self):
+        """Tests that legal moves are exactly the pseudo legal moves that
+        do not leave the king attacked."""
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                    "8/8/8/KPp4r/8/8/8/7k w - c6 0 1",
+                    "8/8/8/8/k2Pp2Q/8/8/3K4 b - d3 0 1",
+                    "8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1",
+                    "4k3/8/8/8/8/8/8/8 w - - 0 1"]:
+            pos = chess.Position(fen)
+            expected = set()
+            for move in pos.get_pseudo_legal_moves():
+                pos.make_move(move, False)
+                if not pos.is_king_attacked(chess.opposite_color(pos.turn)):
+                    expected.add(move)
+                pos.unmake_move()
+            self.assertEqual(set(pos.get_legal_moves()), expected)
+
+        # En-passant capture would expose the king on the rank.
+        pos = chess.Position("8/8/8/KPp4r/8/8/8/7k w - c6 0 1")
+        self.assertFalse(chess.Move.from_uci("b5c6") in pos.get_legal_moves())
+
+        # En-passant capture of the pawn giving check.
+        pos = chess.Position("8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1")
+        self.assertTrue(chess.Move.from_uci("e4d3") in pos.get_legal_moves())
+
+    def test_attackers(self):
+        """Tests finding the attackers of a square."""
+        pos = chess.Position("r1bqkb1r/pppp1Qpp/2n2n2/4p3/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 4")
+        self.assertEqual(set(pos.get_attackers("w", chess.Square("f7"))),
+                         set([chess.Square("c4")]))
+        self.assertEqual(set(pos.get_attackers("b", chess.Square("f7"))),
+                         set([chess.Square("e8")]))
+        self.assertEqual(set(pos.get_attackers("b", chess.Square("e5"))),
+                         set([chess.Square("c6")]))
+        self.assertEqual(set(pos.get_attackers("w", chess.Square("h6"))), set())
+        self.assertEqual(set(pos.get_attackers("b", chess.Square("d4"))),
+                         set([chess.Square("c6"), chess.Square("e5")]))
+        self.assertTrue(pos.is_attacked("w", chess.Square("e8")))
+        self.assertFalse(pos.is_attacked("w", chess.Square("a8")))
+        self.assertTrue(pos.is_check())
+
+        # Sliders are blocked by pieces in between.
+        pos = chess.Position("4k3/8/8/8/4p3/8/8/R3K2r w - - 0 1")
+        self.assertTrue(pos.is_attacked("b", chess.Square("g1")))
+        self.assertTrue(pos.is_check())
+        self.assertFalse(pos.is_attacked("b", chess.Square("e2")))
+        self.assertTrue(pos.is_attacked("w", chess.Square("a8")))
+        self.assertFalse(pos.is_attacked("w", chess.Square("e5")))
+
+    def test_is_attacked(self):
+        """Tests single square attack checks with and without a cached
+        attack map."""
+        for fen in [chess.START_FEN,
+                    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"]:
+            for color in "wb":
+                pos = chess.Position(fen)
+                scanned = [pos.is_attacked(color, square) for square in chess.SQUARES]
+                attacks = pos.get_attacks(color)
+                self.assertEqual(scanned, [pos.is_attacked(color, square) for square in chess.SQUARES])
+                self.assertEqual(scanned, [bool(attacks & chess.BB_SQUARES[square.index]) for square in chess.SQUARES])
+        self.assertRaises(KeyError, chess.Position().is_attacked, "x", "e4")
+
+    def test_attack_maps(self):
+        """Tests that cached attack maps follow changes of the position."""
+        pos = chess.Position()
+        self.assertEqual(pos.get_attacks("w"),
+                         (chess.BB_RANKS[1] | chess.BB_RANKS[2] | chess.BB_RANKS[0]) &
+                         ~chess.BB_SQUARES[0] & ~chess.BB_SQUARES[7])
+        self.assertEqual(pos.get_attacker_count("w", chess.Square("f3")), 3)
+        self.assertEqual(pos.get_attacker_count("b", chess.Square("f3")), 0)
+        self.assertFalse(pos.is_check())
+
+        copy = pos.copy()
+        for uci in ["e2e4", "e7e5", "d1h5", "b8c6", "f1c4", "g8f6", "h5f7"]:
+            copy.make_move(chess.Move.from_uci(uci))
+        self.assertTrue(copy.is_check())
+        self.assertTrue(copy.is_checkmate())
+        self.assertTrue(copy.is_game_over())
+        self.assertEqual(copy.get_attacker_count("w", chess.Square("f7")), 1)
+        self.assertFalse(pos.is_check())
+        self.assertFalse(pos.is_game_over())
+
+        copy.unmake_move()
+        self.assertFalse(copy.is_check())
+        self.assertFalse(copy.is_checkmate())
+        self.assertEqual(copy.get_attacker_count("w", chess.Square("f7")), 2)
+
+        del copy["h5"]
+        self.assertEqual(copy.get_attacker_count("w", chess.Square("f7")), 1)
+        copy["e7"] = chess.Piece("Q")
+        self.assertTrue(copy.is_attacked("w", chess.Square("e8")))
+        copy.toggle_turn()
+        self.assertTrue(copy.is_check())
+
+    def test_int_move_generation(self):
+        """Tests that integer encoded moves match the move objects."""
+        pos = chess.Position("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1")
+        self.assertEqual(
+            [chess.Move.from_int(move) for move in pos.get_legal_move_ints()],
+            list(pos.get_legal_moves()))
+        self.assertEqual(
+            list(pos.get_legal_move_array()), list(pos.get_legal_move_ints()))
+        self.assertEqual(
+            [chess.Move.from_int(move) for move in pos.get_pseudo_legal_move_ints()],
+            list(pos.get_pseudo_legal_moves()))
+
+    def test_perft(self):
+        """Tests perft node counts of the start position and a position
+        with castling, en-passant and promotions."""
+        pos = chess.Position()
+        self.assertEqual(pos.perft(1), 20)
+        self.assertEqual(pos.perft(2), 400)
+        self.assertEqual(pos.perft(3), 8902)
+        self.assertEqual(pos.perft(3, dict()), 8902)
+        self.assertEqual(pos.fen, chess.START_FEN)
+
+        pos = chess.Position("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        counts = pos.divide(2)
+        self.assertEqual(len(counts), 48)
+        self.assertEqual(counts[chess.Move.from_uci("e1g1")], 43)
+        self.assertEqual(sum(counts.values()), 2039)
+
+    def test_unmake_move(self):
+        """Tests that taking back moves restores the position, including
+        castling, en-passant, promotions and captures."""
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                    "rnbqkbnr/1pp1pppp/p7/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3"]:
+            pos = chess.Position(fen)
+            for move in list(pos.get_legal_moves()):
+                pos.make_move(move)
+                for reply in list(pos.get_legal_moves()):
+                    pos.make_move(reply, False)
+                    self.assertEqual(pos.unmake_move(), reply)
+                self.assertEqual(pos.pop(), move)
+                self.assertEqual(pos.fen, fen)
+
+        pos = chess.Position()
+        self.assertRaises(IndexError, pos.unmake_move)
+
+    def test_copy(self):
+        """Tests that copies are independent of the original."""
+        for copy_on_write in [False, True]:
+            pos = chess.Position()
+            pos.make_move(chess.Move.from_uci("e2e4"))
+            copy = pos.copy(copy_on_write)
+            self.assertEqual(copy.fen, pos.fen)
+
+            pos.make_move(chess.Move.from_uci("e7e5"))
+            self.assertEqual(copy.fen, "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+            self.assertEqual(copy.get_piece_counts("b")["p"], 8)
+
+            copy = pos.copy(copy_on_write)
+            del copy["e4"]
+            self.assertEqual(pos["e4"], chess.Piece("P"))
+
+            copy = pos.copy(copy_on_write)
+            copy.unmake_move()
+            self.assertEqual(copy.unmake_move(), chess.Move.from_uci("e2e4"))
+            self.assertEqual(pos.fen, "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+            self.assertEqual(pos.pop(), chess.Move.from_uci("e7e5"))
+
     def test_get_set(self):
         """Tests the get and set methods."""
         pos = chess.Position()
@@ -231,10 +539,401 @@ Kasparov vs. Deep Blue game."""
         pos[chess.Square("e4")] = chess.Piece("r")
         self.assertEqual(pos["e4"], chess.Piece("r"))
 
+    def test_bitboards(self):
+        """Tests that the bitboards follow changes of the board."""
+        pos = chess.Position()
+        self.assertEqual(pos.get_bitboard(chess.Piece("N")),
+                         chess.BB_SQUARES[1] | chess.BB_SQUARES[6])
+        self.assertEqual(pos.get_bitboard(color="b"),
+                         chess.BB_RANKS[6] | chess.BB_RANKS[7])
+
+        pos["e4"] = chess.Piece("N")
+        del pos["b1"]
+        pos["g1"] = chess.Piece("q")
+        self.assertEqual(pos.get_bitboard(chess.Piece("N")),
+                         chess.BB_SQUARES[chess.Square("e4").index])
+        self.assertEqual(pos.get_piece_counts("w")["n"], 1)
+        self.assertEqual(pos.get_piece_counts("b")["q"], 2)
+        self.assertEqual(pos.get_king("b"), chess.Square("e8"))
+        self.assertEqual(pos.fen, "rnbqkbnr/pppppppp/8/8/4N3/8/PPPPPPPP/R1BQKBqR w KQkq - 0 1")
+
+        self.assertEqual(pos.get_squares(chess.Piece("q")),
+                         [chess.Square("g1"), chess.Square("d8")])
+        self.assertEqual(len(pos.get_squares(color="w")), 15)
+        pos.make_move(chess.Move.from_uci("e1f1"), validate=False)
+        self.assertEqual(pos.get_king("w"), chess.Square("f1"))
+        pos.unmake_move()
+        self.assertEqual(pos.get_king("w"), chess.Square("e1"))
+
+    def test_fen(self):
+        """Tests FEN encoding and decoding."""
+        for fen in [chess.START_FEN,
+                    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+                    "8/8/8/8/8/8/8/8 b - - 99 120"]:
+            self.assertEqual(chess.Position(fen).fen, fen)
+
+        pos = chess.Position()
+        for fen in ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1",
+                    "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNRR w KQkq - 0 1",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBN w KQkq - 0 1",
+                    "rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                    "rnbqkbnr/pppppppp/17/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w QK - 0 1",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e4 0 1",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 01 1",
+                    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 0"]:
+            self.assertRaises(chess.FenError, setattr, pos, "fen", fen)
+            self.assertEqual(pos.fen, chess.START_FEN)
+
+    def test_epd(self):
+        """Tests EPD encoding and decoding."""
+        pos, operations = chess.Position.from_epd(
+            'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - bm Qxf7#; id "Scholar\'s mate";fmvn 4;hmvc 4;')
+        self.assertEqual(operations, {
+            "bm": ["Qxf7#"],
+            "id": ["Scholar's mate"],
+            "fmvn": ["4"],
+            "hmvc": ["4"],
+        })
+        self.assertEqual(pos.fen, "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4")
+        self.assertEqual(pos.get_epd({"bm": "Qxf7#", "id": "Scholar's mate", "c0": ["a", "b"]}),
+                         'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - '
+                         'bm Qxf7#; c0 a b; id "Scholar\'s mate";')
+
+        self.assertEqual(pos.set_epd(chess.Position().get_epd()), {})
+        self.assertEqual(pos.fen, chess.START_FEN)
+        self.assertRaises(chess.FenError, pos.set_epd, "8/8/8/8/8/8/8/8 w -")
+        self.assertRaises(chess.FenError, pos.set_epd, '8/8/8/8/8/8/8/8 w - - id "open')
+
+    def test_bulk_fens(self):
+        """Tests streaming many FENs and EPDs."""
+        fens = ["# Comment", chess.START_FEN, "",
+                "8/8/8/8/8/8/8/8 b - - 99 120\n"]
+        positions = list(chess.read_fens(fens))
+        self.assertEqual(len(positions), 2)
+        handle = StringIO.StringIO()
+        self.assertEqual(chess.write_fens(handle, positions), 2)
+        self.assertEqual(handle.getvalue(),
+                         chess.START_FEN + "\n8/8/8/8/8/8/8/8 b - - 99 120\n")
+
+        handle = StringIO.StringIO()
+        chess.write_epds(handle, [positions[0], (positions[1], {"id": "empty"})])
+        handle.seek(0)
+        entries = list(chess.read_epds(handle))
+        self.assertEqual(entries[0][0], positions[0])
+        self.assertEqual(entries[1][0].get_epd(), "8/8/8/8/8/8/8/8 b - -")
+        self.assertEqual(entries[1][1], {"id": ["empty"]})
+
+    def test_pack(self):
+        """Tests the binary encoding of positions."""
+        fens = [chess.START_FEN,
+                "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b Kq - 5 12",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+                "8/8/8/8/8/8/8/8 b - - 99 1200"]
+        for fen in fens:
+            data = chess.Position(fen).pack()
+            self.assertEqual(len(data), chess.PACKED_SIZE)
+            self.assertEqual(chess.Position.unpack(data).fen, fen)
+
+        pos = chess.Position.unpack(chess.Position().pack())
+        pos.make_move(chess.Move.from_uci("e2e4"))
+        self.assertEqual(pos.get_zobrist_hash(), 0x823c9b50fd114196)
+
+        buffer = chess.pack_positions(chess.Position(fen) for fen in fens)
+        self.assertEqual(len(buffer), 4 * chess.PACKED_SIZE)
+        self.assertEqual([pos.fen for pos in chess.unpack_positions(memoryview(buffer))], fens)
+        self.assertEqual([pos.fen for pos in chess.unpack_positions(str(buffer))], fens)
+
+        self.assertRaises(ValueError, chess.Position.unpack, "short")
+        self.assertRaises(ValueError, list, chess.unpack_positions(buffer[1:]))
+        self.assertRaises(ValueError, chess.Position.unpack, "\xff" * chess.PACKED_SIZE)
+        pos = chess.Position("pppppppp/pppppppp/pppppppp/pppppppp/pppppppp/8/8/8 w - - 0 1")
+        self.assertRaises(ValueError, pos.pack)
+
+    def test_pickle(self):
+        """Tests pickling squares, pieces, moves and positions."""
+        pos = chess.Position("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
+        pos.make_move(chess.Move.from_uci("e5f6"))
+        for protocol in [0, 2]:
+            square = pickle.loads(pickle.dumps(chess.Square("e4"), protocol))
+            self.assertTrue(square is chess.Square("e4"))
+            piece = pickle.loads(pickle.dumps(chess.Piece("K"), protocol))
+            self.assertTrue(piece is chess.Piece("K"))
+            move = pickle.loads(pickle.dumps(chess.Move.from_uci("a7a8q"), protocol))
+            self.assertEqual(move, chess.Move.from_uci("a7a8q"))
+
+            copy = pickle.loads(pickle.dumps(pos, protocol))
+            self.assertEqual(copy, pos)
+            self.assertEqual(copy.unmake_move(), chess.Move.from_uci("e5f6"))
+            self.assertEqual(copy.fen, "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
+
+            frozen = pickle.loads(pickle.dumps(pos.freeze(), protocol))
+            self.assertEqual(frozen, pos.freeze())
+            self.assertEqual(hash(frozen), hash(pos))
+
+    def test_freeze(self):
+        """Tests immutable snapshots of positions."""
+        pos = chess.Position("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
+        frozen = pos.freeze()
+        self.assertEqual(frozen.fen, pos.fen)
+        self.assertEqual(frozen["e5"], chess.Piece("P"))
+        self.assertEqual(frozen[chess.Square("d8")], chess.Piece("q"))
+        self.assertEqual(frozen.ep_file, "f")
+        self.assertEqual(frozen.get_zobrist_hash(), pos.get_zobrist_hash())
+        self.assertEqual(frozen, pos)
+        self.assertEqual(pos, frozen)
+        self.assertEqual(hash(frozen), hash(pos))
+        self.assertRaises(AttributeError, setattr, frozen, "turn", "b")
+
+        # Snapshots do not change with the position.
+        pos.make_move(chess.Move.from_uci("e5f6"))
+        self.assertNotEqual(frozen, pos)
+        self.assertEqual(frozen["f6"], None)
+        thawed = frozen.thaw()
+        self.assertEqual(thawed.fen, frozen.fen)
+        thawed.make_move(chess.Move.from_uci("e5f6"))
+        self.assertEqual(thawed, pos)
+
+        # Usable as dictionary keys.
+        cache = {frozen: 1}
+        self.assertFalse(thawed.freeze() in cache)
+        self.assertEqual(cache[chess.Position(frozen.fen).freeze()], 1)
+
+        # Impossible en-passant files are dropped and the hash is
+        # computed if not given.
+        frozen = chess.Position("4k3/8/8/8/8/8/8/4K3 w - e6 0 1").freeze()
+        self.assertEqual(frozen.ep_file, None)
+        rebuilt = chess.FrozenPosition(frozen.board, "w")
+        self.assertEqual(rebuilt, frozen)
+        self.assertEqual(rebuilt.get_zobrist_hash(), frozen.get_zobrist_hash())
+        self.assertEqual(chess.FrozenPosition(frozen.board, "w", "", "e"), frozen)
+        self.assertEqual(chess.FrozenPosition(frozen.board, "w", "", "e").ep_file, None)
+
+        # Equal positions with different en-passant files give equal
+        # snapshots.
+        board = chess.Position("4k3/8/8/3pP3/8/8/8/4K3 w - - 0 1").freeze().board
+        self.assertEqual(chess.FrozenPosition(board, "w", "", "d").ep_file, "d")
+        self.assertEqual(hash(chess.FrozenPosition(board, "w", "", "a")),
+                         hash(chess.FrozenPosition(board, "w")))
+        self.assertEqual(chess.FrozenPosition(board, "w", "", "d").get_zobrist_hash(),
+                         chess.Position("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1").get_zobrist_hash())
+
+        self.assertRaises(ValueError, chess.FrozenPosition, frozen.board[1:])
+        self.assertRaises(ValueError, chess.FrozenPosition, frozen.board, "w", "qK")
+
+    def test_legal_moves_from(self):
+        """Tests generating and checking the moves of single pieces."""
+        fens = [chess.START_FEN,
+                "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1",
+                "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1"]
+        for fen in fens:
+            pos = chess.Position(fen)
+            legal_moves = set(pos.get_legal_moves())
+            from_squares = set()
+            for square in chess.SQUARES:
+                moves = list(pos.get_legal_moves_from(square))
+                self.assertTrue(all(move.source == square for move in moves))
+                from_squares.update(moves)
+            self.assertEqual(from_squares, legal_moves)
+
+            for move in pos.get_pseudo_legal_moves():
+                self.assertEqual(pos.is_legal(move), move in legal_moves)
+
+        pos = chess.Position("n1n5/PPPk4/8/8/8/8/4Kppp/5N1N w - - 0 1")
+        self.assertEqual(len(list(pos.get_legal_moves_from("b7"))), 12)
+        self.assertFalse(pos.is_legal(chess.Move.from_uci("b7b8")))
+        self.assertTrue(pos.is_legal(chess.Move.from_uci("b7a8n")))
+        self.assertFalse(pos.is_legal(chess.Move.from_uci("e2e4q")))
+        self.assertEqual(list(pos.get_legal_moves_from("a8")), [])
+
+    def test_staged_move_generation(self):
+        """Tests generating captures, quiet moves, checks and evasions
+        separately."""
+        fens = [chess.START_FEN,
+                "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1",
+                "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+                "r3k2r/8/8/8/3pPp2/8/8/R3K1RR b KQkq e3 0 1",
+                "3k4/8/8/8/8/8/8/R3K2R w KQ - 0 1",
+                "4k3/8/8/3pP3/8/8/8/4RK2 w - d6 0 1"]
+        for fen in fens:
+            pos = chess.Position(fen)
+            legal_moves = list(pos.get_legal_moves())
+            captures = list(pos.get_legal_captures())
+            quiet_moves = list(pos.get_legal_quiet_moves())
+            self.assertEqual(len(captures) + len(quiet_moves), len(legal_moves))
+            self.assertEqual(set(captures) | set(quiet_moves), set(legal_moves))
+            for move in captures:
+                self.assertTrue(pos[move.target] or move.promotion or pos[move.source].type == "p")
+
+            checks = set()
+            for move in legal_moves:
+                if pos.copy().make_move(move).is_check():
+                    checks.add(move)
+            self.assertEqual(set(pos.get_legal_checks()), checks)
+
+            evasions = list(pos.get_legal_evasions())
+            self.assertEqual(evasions, legal_moves if pos.is_check() else [])
+
+        # Castling and a discovered check by en-passant.
+        pos = chess.Position("3k4/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+        self.assertTrue(chess.Move.from_uci("e1c1") in pos.get_legal_checks())
+        pos = chess.Position("4k3/8/8/3pP3/8/8/8/4RK2 w - d6 0 1")
+        self.assertEqual([move.uci for move in pos.get_legal_captures()], ["e5d6"])
+        self.assertTrue(chess.Move.from_uci("e5d6") in pos.get_legal_checks())
+
+    def test_count_legal_moves(self):
+        """Tests counting legal moves without generating them."""
+        pos = chess.Position()
+        self.assertEqual(pos.count_legal_moves(), 20)
+        self.assertEqual(pos.get_mobility(), {"p": 16, "n": 4, "b": 0, "r": 0, "q": 0, "k": 0})
+
+        pos = chess.Position("n1n5/PPPk4/8/8/8/8/4Kppp/5N1N w - - 0 1")
+        self.assertEqual(pos.count_legal_moves(), len(list(pos.get_legal_moves())))
+        self.assertEqual(pos.get_mobility()["p"], 12)
+
+        # En-passant captures uncovering a slider, or capturing the
+        # pawn giving check.
+        for fen, count in [("8/8/8/KPp4r/8/8/8/4k3 w - c6 0 1", 4),
+                           ("8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1", 9),
+                           ("4k3/8/8/2KPp1r1/8/8/8/8 w - e6 0 1", 7),
+                           ("8/8/8/8/k2Pp2Q/8/8/3K4 b - d3 0 1", 6)]:
+            pos = chess.Position(fen)
+            self.assertEqual(pos.count_legal_moves(), count)
+            self.assertEqual(len(list(pos.get_legal_moves())), count)
+
+        pos = chess.Position("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        self.assertEqual(pos.count_legal_moves(), 48)
+        self.assertEqual(sum(pos.get_mobility().values()), 48)
+        self.assertEqual(pos.get_mobility()["k"], 4)
+
+    def test_replay(self):
+        """Tests replaying validated move sequences."""
+        moves = ["e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "g8f6", "e1g1", "f6e4"]
+        expected = chess.Position()
+        hashes = []
+        for uci in moves:
+            expected.make_move(chess.Move.from_uci(uci))
+            hashes.append(expected.get_zobrist_hash())
+
+        pos = chess.Position().replay(moves)
+        self.assertEqual(pos, expected)
+        self.assertEqual(pos.fen, "r1bqkb1r/pppp1ppp/2n5/4p3/2B1n3/5N2/PPPP1PPP/RNBQ1RK1 w kq - 0 5")
+
+        ints = [chess.Move.from_uci(uci).to_int() for uci in moves]
+        self.assertEqual(chess.Position().replay(ints), expected)
+        self.assertEqual(list(chess.Position().replay_hashes(moves)), hashes)
+
+        # Moves can be taken back as usual.
+        pos = chess.Position().replay([chess.Move.from_uci(uci) for uci in moves])
+        self.assertEqual(pos.unmake_move(), chess.Move.from_uci("f6e4"))
+        self.assertRaises(TypeError, pos.replay, [None])
+
+    def test_checks_keep_status(self):
+        """Tests that generating checks does not leak facts about the
+        positions after the moves."""
+        fen = "8/3kP3/8/8/8/8/8/7K w - - 0 1"
+        pos = chess.Position(fen)
+        before = (pos.is_king_attacked("b"), pos.status())
+        self.assertEqual(len(list(pos.get_legal_checks())), 2)
+        self.assertEqual((pos.is_king_attacked("b"), pos.status()), before)
+
+        pos = chess.Position(fen)
+        list(pos.get_legal_checks())
+        self.assertFalse(pos.is_king_attacked("b"))
+        self.assertEqual(pos.status(), chess.Position(fen).status())
+
+        # Promotions are tried on a copy, so copy-on-write copies stay
+        # shared.
+        pos = chess.Position(fen)
+        copy = pos.copy(copy_on_write=True)
+        board = pos._Position__board
+        self.assertEqual(len(list(pos.get_legal_checks())), 2)
+        self.assertTrue(pos._Position__board is board)
+        self.assertTrue(copy._Position__board is board)
+
+    def test_legal_move_cache(self):
+        """Tests sharing a cache of legal moves."""
+        cache = chess.LegalMoveCache(2)
+        pos = chess.Position()
+        pos.legal_move_cache = cache
+        self.assertEqual(len(list(pos.get_legal_moves())), 20)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        # Copies and other positions with the same state hit the cache.
+        pos.copy().make_move(chess.Move.from_uci("e2e4"))
+        other = chess.Position()
+        other.legal_move_cache = cache
+        self.assertEqual(other.get_move_info(chess.Move.from_uci("g1f3")).san, "Nf3")
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertRaises(chess.MoveError, other.make_move, chess.Move.from_uci("e2e5"))
+
+        # Least recently used positions are evicted.
+        pos.make_move(chess.Move.from_uci("e2e4"))
+        list(pos.get_legal_moves())
+        pos.make_move(chess.Move.from_uci("e7e5"))
+        list(pos.get_legal_moves())
+        self.assertEqual(len(cache), 2)
+        self.assertFalse(chess.Position().get_zobrist_hash() in cache)
+        self.assertEqual(set(pos.get_legal_moves()), set(chess.Position(pos.fen).get_legal_moves()))
+
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+        self.assertRaises(TypeError, setattr, pos, "legal_move_cache", {})
+
+    @unittest.skipIf(chess.numpy is None, "requires NumPy")
+    def test_planes(self):
+        """Tests exporting positions to NumPy planes and back."""
+        fens = [chess.START_FEN,
+                "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b Kq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1",
+                "8/8/8/8/8/8/8/8 w - - 0 1"]
+        positions = [chess.Position(fen) for fen in fens]
+
+        planes = chess.numpy.zeros((4, 12, 8, 8), dtype=chess.numpy.uint8)
+        features = chess.numpy.zeros((4, 6), dtype=chess.numpy.uint8)
+        result = chess.positions_to_planes(positions, planes, features)
+        self.assertTrue(result[0] is planes)
+        self.assertTrue(result[1] is features)
+
+        # White pawns on the second rank, black king on e8.
+        self.assertEqual(planes[0, 1, 6].tolist(), [1] * 8)
+        self.assertEqual(planes[0, 10, 0, 4], 1)
+        self.assertEqual(planes[0].sum(), 32)
+        self.assertEqual(features.tolist(), [
+            [1, 1, 1, 1, 1, 0],
+            [0, 1, 0, 0, 1, 0],
+            [1, 1, 1, 1, 1, 6],
+            [1, 0, 0, 0, 0, 0]])
+
+        decoded = chess.planes_to_positions(planes, features)
+        self.assertEqual([pos.fen for pos in decoded], fens)
+        self.assertEqual(chess.planes_to_positions(planes[:1])[0].fen,
+                         "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1")
+
+        planes[0, 0, 3, 3] = planes[0, 1, 3, 3] = 1
+        self.assertRaises(ValueError, chess.planes_to_positions, planes)
+
     def test_ep_file(self):
         pos = chess.Position("rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 2")
         self.assertEqual(pos.ep_file, "d")
 
+    def test_ep_move_generation(self):
+        """Tests that en-passant captures only land on the en-passant
+        square."""
+        pos = chess.Position("rnbqkbnr/1pp1pppp/p7/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3")
+        legal_moves = list(pos.get_legal_moves())
+        self.assertTrue(chess.Move.from_uci("e5d6") in legal_moves)
+        self.assertFalse(chess.Move.from_uci("c2d3") in legal_moves)
+        self.assertEqual(len(legal_moves), 31)
+
     def test_san_moves(self):
         """Tests making moves from SANs."""
         pos = chess.Position()
@@ -255,6 +954,27 @@ Kasparov vs. Deep Blue game."""
 
         self.assertEqual(pos.fen, 'rnbqk1nr/pp1ppp1p/6p1/2p5/4P3/2PP4/P1P1NPPP/R1BQKB1R b KQkq - 0 5')
 
+    def test_san_parsing(self):
+        """Tests parsing of special and invalid SANs."""
+        pos = chess.Position("r3k2r/1P6/8/3pP3/8/8/8/R3K1NR w KQkq d6 0 1")
+        self.assertEqual(pos.get_move_from_san("O-O-O"), chess.Move.from_uci("e1c1"))
+        self.assertEqual(pos.get_move_from_san("exd6"), chess.Move.from_uci("e5d6"))
+        self.assertEqual(pos.get_move_from_san("bxa8=Q+"), chess.Move.from_uci("b7a8q"))
+        self.assertEqual(pos.get_move_from_san("b8=N"), chess.Move.from_uci("b7b8n"))
+        self.assertRaises(chess.MoveError, pos.get_move_from_san, "O-O")
+        self.assertRaises(chess.MoveError, pos.get_move_from_san, "b8")
+        self.assertRaises(chess.MoveError, pos.get_move_from_san, "Nd4")
+        self.assertRaises(ValueError, pos.get_move_from_san, "Nz4")
+
+        pos = chess.Position("4k3/8/8/8/8/8/4N3/1N2K3 w - - 0 1")
+        self.assertRaises(chess.MoveError, pos.get_move_from_san, "Nc3")
+        self.assertEqual(pos.get_move_from_san("Nec3"), chess.Move.from_uci("e2c3"))
+
+        cache = dict()
+        self.assertEqual(pos.get_move_from_san("Nbc3", cache), chess.Move.from_uci("b1c3"))
+        self.assertEqual(cache.values(), [chess.Move.from_uci("b1c3")])
+        self.assertEqual(pos.get_move_from_san("Nbc3", cache), chess.Move.from_uci("b1c3"))
+
 
 class SquareTestCase(unittest.TestCase):
     """Tests the Square class."""
@@ -291,6 +1011,13 @@ class SquareTestCase(unittest.TestCase):
         self.assertEqual(chess.Square.from_x_and_y(3, 5), chess.Square("d6"))
         self.assertEqual(chess.Square.from_x88(2), chess.Square("c8"))
         self.assertEqual(chess.Square.from_rank_and_file(rank=2, file="g"), chess.Square("g2"))
+        self.assertEqual(chess.Square.from_index(63), chess.Square("h8"))
+        self.assertTrue(chess.Square.from_x88(0x44) is chess.Square("e4"))
+        self.assertTrue(chess.Piece("q") is chess.Piece.from_color_and_type("b", "queen"))
+        self.assertRaises(ValueError, chess.Square.from_x88, 0x08)
+        self.assertRaises(IndexError, chess.Square.from_x_and_y, -1, 0)
+        self.assertRaises(ValueError, chess.Square, "i9")
+        self.assertRaises(ValueError, chess.Piece, "x")
 
 
 class UtilTestCase(unittest.TestCase):
@@ -329,6 +1056,36 @@ on http://hardy.uhasselt.be/Toga/book_format.html."""
         pos = chess.Position("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
         self.assertEqual(hasher.hash_position(pos), 0x22a48b5a8e47ff78)
 
+    def test_incremental_hashing(self):
+        """Tests that the position keeps its hash up to date."""
+        hasher = chess.ZobristHasher(chess.ZobristHasher.POLYGLOT_RANDOM_ARRAY)
+
+        pos = chess.Position()
+        self.assertEqual(pos.get_zobrist_hash(), 0x463b96181691fc9c)
+
+        for uci in ["e2e4", "d7d5", "e4e5", "f7f5", "e1e2", "e8f7"]:
+            pos.make_move(chess.Move.from_uci(uci))
+            self.assertEqual(pos.get_zobrist_hash(), hasher.hash_position(pos))
+        self.assertEqual(pos.get_zobrist_hash(), 0x00fdd303c946bdd9)
+
+        while pos.ply > 1 or pos.turn == "b":
+            pos.unmake_move()
+            self.assertEqual(pos.get_zobrist_hash(), hasher.hash_position(pos))
+        self.assertEqual(pos.get_zobrist_hash(), 0x463b96181691fc9c)
+
+        pos["e4"] = chess.Piece("Q")
+        del pos["a1"]
+        pos.set_castling_right("Q", False)
+        pos.toggle_turn()
+        self.assertEqual(pos.get_zobrist_hash(), hasher.hash_position(pos))
+        self.assertEqual(pos.copy().get_zobrist_hash(), pos.get_zobrist_hash())
+
+        pos = chess.Position("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        for move in pos.get_legal_moves():
+            pos.make_move(move, validate=False)
+            self.assertEqual(pos.get_zobrist_hash(), hasher.hash_position(pos))
+            pos.unmake_move()
+
     def test_random_hasher(self):
         """Tests zobrist hashing with a random field."""
         random.seed(3456789)
@@ -0,0 +1,120 @@
+import unittest
+import chess
+import engine
+
+
+class EvaluateTestCase(unittest.TestCase):
+    """Tests for the evaluate function."""
+
+    def test_symmetry(self):
+        """Tests that mirrored positions evaluate the same."""
+        self.assertEqual(engine.evaluate(chess.Position()), 0)
+
+        pos = chess.Position("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        mirrored = chess.Position("r3k2r/pppbbppp/2n2q1P/1P2p3/3pn3/BN2PNP1/P1PPQPB1/R3K2R b KQkq - 0 1")
+        self.assertEqual(engine.evaluate(pos), engine.evaluate(mirrored))
+
+    def test_material(self):
+        """Tests that extra material counts for the side to move."""
+        pos = chess.Position("4k3/8/8/8/8/8/8/Q3K3 w - - 0 1")
+        self.assertTrue(engine.evaluate(pos) > 800)
+        pos.toggle_turn()
+        self.assertTrue(engine.evaluate(pos) < -800)
+
+
+class SearcherTestCase(unittest.TestCase):
+    """Tests for the Searcher class."""
+
+    def test_mate_in_one(self):
+        """Tests finding a back rank mate."""
+        pos = chess.Position("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        result = engine.Searcher().search(pos, depth=2)
+        self.assertEqual(result.move, chess.Move.from_uci("a1a8"))
+        self.assertEqual(result.score, engine.MATE_SCORE - 1)
+        self.assertEqual(result.pv, [chess.Move.from_uci("a1a8")])
+
+        # The position itself is not changed.
+        self.assertEqual(pos.fen, "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+
+    def test_legal_move_cache(self):
+        """Tests that searching leaves the legal move cache of the
+        position alone."""
+        cache = chess.LegalMoveCache(4)
+        pos = chess.Position()
+        pos.legal_move_cache = cache
+        engine.Searcher().search(pos, depth=3)
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+        self.assertTrue(pos.legal_move_cache is cache)
+
+    def test_quiescence_checks(self):
+        """Tests that the quiescence search sees mates and does not
+        stand pat in check."""
+        pos = chess.Position("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        result = engine.Searcher().search(pos, depth=1)
+        self.assertEqual(result.move, chess.Move.from_uci("a1a8"))
+        self.assertEqual(result.score, engine.MATE_SCORE - 1)
+
+    def test_mate_in_two(self):
+        """Tests finding a forced mate with a queen sacrifice."""
+        pos = chess.Position("r1b2k1r/ppp1bppp/8/1B1Q4/5q2/2P5/PPP2PPP/R3R1K1 w - - 1 1")
+        result = engine.Searcher().search(pos, depth=4)
+        self.assertEqual(result.move, chess.Move.from_uci("d5d8"))
+        self.assertEqual(result.score, engine.MATE_SCORE - 3)
+        self.assertEqual([move.uci for move in result.pv], ["d5d8", "e7d8", "e1e8"])
+
+    def test_repetitions(self):
+        """Tests that repeating a game position counts as a draw."""
+        pos = chess.Position("7k/8/8/8/8/8/q7/6K1 w - - 0 1")
+        for uci in ["g1f1", "h8g8", "f1g1", "g8h8"]:
+            pos.make_move(chess.Move.from_uci(uci))
+        result = engine.Searcher().search(pos, depth=2)
+        self.assertEqual(result.move, chess.Move.from_uci("g1f1"))
+        self.assertEqual(result.score, 0)
+
+    def test_fifty_moves(self):
+        """Tests the fifty-move rule."""
+        # Mate on the hundredth half move is still mate.
+        pos = chess.Position("8/7k/R7/1R1P4/8/8/8/K7 w - - 97 1")
+        result = engine.Searcher().search(pos, depth=4)
+        self.assertEqual(result.move, chess.Move.from_uci("b5b7"))
+        self.assertEqual(result.score, engine.MATE_SCORE - 3)
+
+    def test_tactics(self):
+        """Tests winning a hanging piece and avoiding a losing capture."""
+        pos = chess.Position("4k3/8/8/3q4/8/8/3R4/3RK3 w - - 0 1")
+        result = engine.Searcher().search(pos, depth=2)
+        self.assertEqual(result.move, chess.Move.from_uci("d2d5"))
+
+        pos = chess.Position("4k3/2p5/3p4/8/8/8/8/3QK3 w - - 0 1")
+        result = engine.Searcher().search(pos, depth=2)
+        self.assertNotEqual(result.move, chess.Move.from_uci("d1d6"))
+
+    def test_game_over(self):
+        """Tests searching positions without legal moves."""
+        result = engine.Searcher().search(chess.Position("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"), depth=3)
+        self.assertEqual(result.move, None)
+        self.assertEqual(result.score, 0)
+
+        result = engine.Searcher().search(chess.Position("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1"), depth=3)
+        self.assertEqual(result.move, None)
+        self.assertEqual(result.score, -engine.MATE_SCORE)
+
+    def test_limits(self):
+        """Tests iterative deepening and search limits."""
+        depths = []
+        searcher = engine.Searcher()
+        result = searcher.search(chess.Position(), depth=3,
+                                 callback=lambda result: depths.append(result.depth))
+        self.assertEqual(depths, [1, 2, 3])
+        self.assertEqual(result.depth, 3)
+        self.assertTrue(result.move in chess.Position().get_legal_moves())
+
+        result = searcher.search(chess.Position(), nodes=2000)
+        self.assertTrue(result.nodes < 4000)
+        self.assertTrue(result.depth >= 1)
+
+        result = searcher.search(chess.Position(), movetime=0.2)
+        self.assertTrue(result.seconds < 1.0)
+
+        self.assertRaises(ValueError, searcher.search, chess.Position())
+        self.assertRaises(ValueError, searcher.search, chess.Position(), depth=0)